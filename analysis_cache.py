@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import numpy as np
+from typing import Dict, Optional
+from utils import atomic_write, file_digest
+from config import ANALYSIS_CACHE_DIR, ANALYSIS_CACHE_SETTINGS
+
+class AnalysisCache:
+    """音声データのダイジェストと解析パラメータをキーにした永続キャッシュ
+
+    エントリは1件1ファイル（.npz）で保存し、更新時刻を最終アクセス時刻として
+    LRU方式で古いものから削除する。複数プロセスから同時に使っても
+    インデックスが壊れないよう、状態はファイルシステムだけに持つ。
+    """
+
+    SUFFIX = '.npz'
+
+    def __init__(self, cache_dir: str = ANALYSIS_CACHE_DIR,
+                 max_entries: int = ANALYSIS_CACHE_SETTINGS['max_entries'],
+                 max_bytes: int = ANALYSIS_CACHE_SETTINGS['max_bytes']):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, file_path: str, params: Dict) -> str:
+        """ファイル内容とパラメータからキャッシュキーを生成"""
+        payload = json.dumps(
+            {'digest': file_digest(file_path), 'params': params},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.SUFFIX}")
+
+    def contains(self, key: str) -> bool:
+        """統計を更新せずにエントリの有無を確認"""
+        return os.path.exists(self._entry_path(key))
+
+    def _load(self, path: str) -> Dict:
+        with np.load(path) as npz:
+            data = {name: npz[name] for name in npz.files}
+        return {name: value if value.ndim else value.item() for name, value in data.items()}
+
+    def _save(self, f, data: Dict) -> None:
+        np.savez(f, **data)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """キャッシュからデータを取得（ヒット時はアクセス時刻を更新）"""
+        path = self._entry_path(key)
+        try:
+            data = self._load(path)
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: Dict) -> None:
+        """配列・スカラーの辞書をアトミックに書き込み、予算を超えた分を削除"""
+        atomic_write(self._entry_path(key), lambda f: self._save(f, data))
+        self.evict()
+
+    def _entries(self) -> list:
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(self.SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def evict(self) -> None:
+        """エントリ数・合計サイズの上限を超えた分を古い順に削除"""
+        entries = sorted(self._entries())
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or
+                           total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """全エントリを削除"""
+        for _, _, path in self._entries():
+            os.remove(path)
+
+    def get_stats(self) -> Dict:
+        """ヒット率などの統計情報を返す"""
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries)
+        }
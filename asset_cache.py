@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import pygame
+from typing import List, Optional, Tuple
+from utils import atomic_write, file_digest
+from config import ASSET_CACHE_DIR
+
+# キャッシュの形式を変えたら上げる
+ASSET_CACHE_VERSION = 1
+
+Size = Tuple[int, int]
+
+class AssetCache:
+    """拡大縮小済みの画像をピクセル列のままディスクに保持するキャッシュ
+
+    キーは元画像のダイジェストと表示サイズ。PNGのデコードと拡大縮小を省き、
+    次回以降はファイルを読んでサーフェスに詰めるだけにする。画面のピクセル形式への
+    変換（convert）は画面を持つメインスレッドで行うので、ここで作るサーフェスは
+    どのスレッドから読み込んでもよい。
+    """
+
+    def __init__(self, cache_dir: str = ASSET_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _key(self, digests: List[str], size: Size, mode: str) -> str:
+        payload = json.dumps({
+            'version': ASSET_CACHE_VERSION,
+            'digests': digests,
+            'size': list(size),
+            'mode': mode
+        })
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.raw")
+
+    def _read(self, key: str, size: Size, mode: str) -> Optional[pygame.Surface]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) != size[0] * size[1] * len(mode):
+            return None
+        return pygame.image.frombytes(data, size, mode)
+
+    def _write(self, key: str, data: bytes) -> None:
+        """一時ファイルに書いてから置き換え、読み込み途中のファイルを見せない"""
+        try:
+            atomic_write(self._path(key), lambda f: f.write(data))
+        except OSError:
+            pass  # キャッシュに書けなくても次回また拡大縮小するだけ
+
+    def _decode(self, path: str, size: Size, mode: str) -> bytes:
+        """PNGを読み込んでsizeに拡大縮小し、modeのピクセル列にする"""
+        return pygame.image.tobytes(pygame.transform.scale(pygame.image.load(path), size), mode)
+
+    def load_image(self, path: str, size: Size, alpha: bool = True) -> pygame.Surface:
+        """sizeに拡大縮小した画像を返す（画面形式への変換は呼び出し側で行う）"""
+        mode = 'RGBA' if alpha else 'RGB'
+        key = self._key([file_digest(path)], size, mode)
+        surface = self._read(key, size, mode)
+        if surface is None:
+            data = self._decode(path, size, mode)
+            self._write(key, data)
+            surface = pygame.image.frombytes(data, size, mode)
+        return surface
+
+    def load_atlas(self, paths: List[str], cell_size: Size) -> Tuple[pygame.Surface, List[pygame.Rect]]:
+        """複数の画像をcell_sizeに揃えて縦一列に並べたアトラスと、各画像の範囲を返す
+
+        縦に並べると各画像のピクセル列を連結するだけでアトラスになるので、
+        アルファ合成を通さずに元の画素値のまま詰められる。
+        """
+        width, height = cell_size
+        rects = [pygame.Rect(0, i * height, width, height) for i in range(len(paths))]
+        size = (width, height * len(paths))
+        key = self._key([file_digest(path) for path in paths], size, 'RGBA')
+        atlas = self._read(key, size, 'RGBA')
+        if atlas is None:
+            data = b''.join(self._decode(path, cell_size, 'RGBA') for path in paths)
+            self._write(key, data)
+            atlas = pygame.image.frombytes(data, size, 'RGBA')
+        return atlas, rects
+
+    def clear(self) -> None:
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.raw'):
+                os.remove(os.path.join(self.cache_dir, name))
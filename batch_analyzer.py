@@ -0,0 +1,84 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+from song_analyzer import SongAnalyzer
+from utils import find_audio_files
+from config import SONGS_DIR, AUDIO_EXTENSIONS, BATCH_ANALYSIS_WORKERS
+
+_worker_analyzer: Optional[SongAnalyzer] = None
+
+def _init_worker() -> None:
+    """ワーカープロセスごとに解析器を1つだけ作る"""
+    global _worker_analyzer
+    _worker_analyzer = SongAnalyzer()
+
+def _analyze_file(file_path: str) -> Tuple[str, Dict, int]:
+    """ワーカープロセスで1曲を解析（キャッシュの追い出し件数も返す）"""
+    evictions = _worker_analyzer.cache.evictions
+    rhythm_data = _worker_analyzer.analyze_song(file_path)
+    return file_path, rhythm_data, _worker_analyzer.cache.evictions - evictions
+
+def analyze_directory(
+    directory: str = SONGS_DIR, workers: Optional[int] = None,
+    skip: Optional[set] = None, progress_callback=None,
+    analyzer: Optional[SongAnalyzer] = None
+) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """ディレクトリ内の音声ファイルをプロセスプールで並列に解析
+
+    キャッシュ済みの曲は解析せずキャッシュから読み込む。skipに含まれる
+    パスは対象外とする。戻り値は (パス→リズムデータ, パス→エラーメッセージ)。
+    ワーカープロセスでのキャッシュの追い出しはanalyzerの統計に合算する。
+    """
+    analyzer = analyzer or SongAnalyzer()
+    skip = skip or set()
+    results: Dict[str, Dict] = {}
+    errors: Dict[str, str] = {}
+    pending: List[str] = []
+
+    for file_path in find_audio_files(directory, AUDIO_EXTENSIONS):
+        if file_path in skip:
+            continue
+        cached = analyzer._get_cached_analysis(file_path)
+        if cached:
+            results[file_path] = cached
+        else:
+            pending.append(file_path)
+
+    if progress_callback:
+        progress_callback(f"{len(pending)}曲を解析します（キャッシュ済み: {len(results)}曲）", 0)
+    if not pending:
+        return results, errors
+
+    workers = workers or BATCH_ANALYSIS_WORKERS or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(pending)),
+                             initializer=_init_worker) as executor:
+        futures = {executor.submit(_analyze_file, path): path for path in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            file_path = futures[future]
+            try:
+                _, rhythm_data, evictions = future.result()
+                results[file_path] = rhythm_data
+                analyzer.cache.evictions += evictions
+            except Exception as e:
+                errors[file_path] = str(e)
+            if progress_callback:
+                progress_callback(
+                    f"解析中: {os.path.basename(file_path)}",
+                    int(done / len(pending) * 100)
+                )
+
+    return results, errors
+
+def analyze_into_library(song_library, workers: Optional[int] = None,
+                         progress_callback=None,
+                         analyzer: Optional[SongAnalyzer] = None) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """未登録の曲を一括解析し、結果をライブラリに1回の保存でまとめて登録"""
+    results, errors = analyze_directory(
+        song_library.songs_dir, workers,
+        skip=set(song_library.get_song_list()),
+        progress_callback=progress_callback,
+        analyzer=analyzer
+    )
+    if results:
+        song_library.add_songs(results)
+    return results, errors
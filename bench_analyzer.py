@@ -0,0 +1,271 @@
+"""合成音源でSongAnalyzerの解析時間とメモリ使用量を計測するベンチマーク
+
+既知のBPMのクリックトラックとノイズを長さ別（既定で1・5・30分）に生成し、
+解析の段階（デコード・STFT・オンセット・ビート・クロマ・MFCC・パターン生成・
+キャッシュ書き込み）ごとの所要時間とピークメモリを計測する。保存した
+ベースラインと比較し、許容幅を超えて遅く（大きく）なったら終了コード1を返す。
+ベースラインは計測したマシンでしか意味がないのでリポジトリには含めない。
+ベースラインが無い（または今回のケースを含まない）ときは比較できないので
+終了コード2を返す。最初に--save-baselineで作成すること。
+ベースラインは計測モード（プロファイル・ストリーミング・PCMキャッシュの有無）ごとに
+別のキーで保存し、同じモードの結果とだけ比較する。
+
+    python bench_analyzer.py --save-baseline
+    python bench_analyzer.py --lengths 1 5 --tolerance 0.3
+
+--streamingでは、同じ種類の音源のピークメモリが長さによらず一定であることも確認する。
+
+    python bench_analyzer.py --streaming --lengths 1 10 30
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import soundfile as sf
+from typing import Dict, List, Optional, Tuple
+from analysis_cache import AnalysisCache
+from pcm_cache import PCMCache
+from song_analyzer import SongAnalyzer
+from config import BASE_DIR, CACHE_DIR
+from utils import load_json, save_json
+
+DEFAULT_BASELINE = os.path.join(BASE_DIR, "bench_analyzer_baseline.json")
+TRACK_DIR = os.path.join(CACHE_DIR, "bench_tracks")
+TRACK_SR = 44100          # 解析時のリサンプリングも計測に含めるため44.1kHzで生成
+BLOCK_SECONDS = 10        # 生成時に一度に書き込む秒数
+TEMPO_BPMS = (90, 150)    # 最短の長さで追加するテンポ推定確認用のBPM
+MIN_REGRESSION_S = 0.01   # これ未満の差は計測誤差として扱う
+MIN_PEAK_GROWTH_MB = 8.0  # ストリーミング解析で長さに比例して増えてよい分（フレームごとのスカラー列）
+
+def track_name(kind: str, minutes: float, bpm: Optional[int]) -> str:
+    return f"{kind}{bpm or ''}_{minutes:g}m"
+
+def bench_mode(analyzer: SongAnalyzer, warm_pcm: bool) -> str:
+    """計測モード（"<プロファイル>/<stream|full>/<warm|cold>"）"""
+    return (f"{analyzer.profile}/{'stream' if analyzer.streaming else 'full'}/"
+            f"{'warm' if warm_pcm else 'cold'}")
+
+def baseline_key(case: Dict) -> str:
+    """ベースラインのキー（モードが違う結果同士を比較しないようモードを含める）"""
+    return f"{case['mode']}/{case['name']}"
+
+def write_track(path: str, kind: str, minutes: float, bpm: Optional[int] = None,
+                sr: int = TRACK_SR, seed: int = 0) -> None:
+    """クリックトラック（一定BPMの減衰サイン波）またはホワイトノイズを書き出す
+
+    30分の音源でもメモリを使いすぎないようブロック単位で生成する。
+    """
+    total = int(minutes * 60 * sr)
+    block_size = BLOCK_SECONDS * sr
+    click_len = int(0.02 * sr)
+    t = np.arange(click_len) / sr
+    click = 0.8 * np.sin(2 * np.pi * 1000 * t) * np.exp(-t * 300)
+    period = 60.0 / bpm * sr if bpm else None
+    rng = np.random.default_rng(seed)
+
+    with sf.SoundFile(path, 'w', sr, 1, 'PCM_16') as f:
+        for start in range(0, total, block_size):
+            n = min(block_size, total - start)
+            if kind == 'noise':
+                f.write((rng.standard_normal(n) * 0.1).astype(np.float32))
+                continue
+            block = np.zeros(n, dtype=np.float32)
+            # ブロックにかかるクリックを重ねる（前のブロックからはみ出た分も含む）
+            first = max(0, math.ceil((start - click_len) / period))
+            for k in range(first, math.ceil((start + n) / period)):
+                pos = int(round(k * period)) - start
+                lo, hi = max(pos, 0), min(pos + click_len, n)
+                if lo < hi:
+                    block[lo:hi] += click[lo - pos:hi - pos]
+            f.write(block)
+
+def ensure_track(kind: str, minutes: float, bpm: Optional[int], track_dir: str = TRACK_DIR) -> str:
+    """合成音源を用意する（生成済みなら再利用）"""
+    os.makedirs(track_dir, exist_ok=True)
+    path = os.path.join(track_dir, f"{track_name(kind, minutes, bpm)}.wav")
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp.wav"
+        write_track(tmp_path, kind, minutes, bpm)
+        os.replace(tmp_path, path)
+    return path
+
+def build_cases(lengths: List[float]) -> List[Tuple[str, float, Optional[int]]]:
+    """(種類, 分, BPM) の計測ケース一覧"""
+    cases = []
+    for minutes in lengths:
+        cases.append(('click', minutes, 120))
+        cases.append(('noise', minutes, None))
+    for bpm in TEMPO_BPMS:
+        cases.append(('click', min(lengths), bpm))
+    return cases
+
+def analyze_once(analyzer: SongAnalyzer, path: str, trace_memory: bool,
+                 warm_pcm: bool = False) -> Tuple[Dict, Dict, int]:
+    """キャッシュを空にして1回解析し、(結果, 段階別時間, ピークメモリ) を返す
+
+    warm_pcmならデコード済みPCMのキャッシュは残し、再解析の時間を測る。
+    """
+    analyzer.cache.clear()
+    if not warm_pcm:
+        analyzer.pcm_cache.clear()
+    analyzer.stage_times = {}
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = analyzer.analyze_song(path)
+        analyzer.stage_times['total'] = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return result, analyzer.stage_times, peak
+
+def run_case(analyzer: SongAnalyzer, kind: str, minutes: float, bpm: Optional[int],
+             repeat: int = 1, warm_pcm: bool = False) -> Dict:
+    """1ケースを計測（時間はrepeat回の最小値、メモリは別の1回で計測）"""
+    path = ensure_track(kind, minutes, bpm)
+    if warm_pcm:
+        analyze_once(analyzer, path, trace_memory=False)
+    runs = [analyze_once(analyzer, path, trace_memory=False, warm_pcm=warm_pcm) for _ in range(repeat)]
+    result = runs[0][0]
+    stages = {name: min(times[name] for _, times, _ in runs) for name in runs[0][1]}
+    # tracemallocは計測対象を遅くするので、時間とは別の実行でピークメモリを測る
+    _, _, peak = analyze_once(analyzer, path, trace_memory=True, warm_pcm=warm_pcm)
+    return {
+        'name': track_name(kind, minutes, bpm),
+        'mode': bench_mode(analyzer, warm_pcm),
+        'kind': kind,
+        'minutes': minutes,
+        'bpm': bpm,
+        'tempo': float(result['tempo']),
+        'patterns': int(len(result['chart'])),
+        'stages_s': stages,
+        'realtime_factor': minutes * 60 / stages['total'],
+        'peak_mb': peak / (1024 * 1024)
+    }
+
+def warm_up(analyzer: SongAnalyzer) -> None:
+    """numbaのJITコンパイルや遅延インポートを計測から除くため短い音源を一度解析する"""
+    analyze_once(analyzer, ensure_track('click', 0.1, 120), trace_memory=False)
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """ベースラインに対して許容幅を超えた項目を返す"""
+    regressions = []
+    for case in results:
+        base = baseline.get(baseline_key(case))
+        if base is None:
+            continue
+        for stage, seconds in case['stages_s'].items():
+            base_seconds = base['stages_s'].get(stage)
+            if base_seconds is None:
+                continue
+            limit = max(base_seconds * (1 + tolerance), base_seconds + MIN_REGRESSION_S)
+            if seconds > limit:
+                regressions.append(
+                    f"{case['name']} {stage}: {seconds:.3f}s > {base_seconds:.3f}s (+{tolerance:.0%})"
+                )
+        if case['peak_mb'] > base['peak_mb'] * (1 + tolerance):
+            regressions.append(
+                f"{case['name']} peak: {case['peak_mb']:.1f}MB > {base['peak_mb']:.1f}MB (+{tolerance:.0%})"
+            )
+    return regressions
+
+def check_flat_memory(results: List[Dict], tolerance: float) -> List[str]:
+    """同じ種類の音源で、最長のケースのピークメモリが最短のケースから増えていないか"""
+    groups: Dict[Tuple[str, Optional[int]], List[Dict]] = {}
+    for case in results:
+        groups.setdefault((case['kind'], case['bpm']), []).append(case)
+    growths = []
+    for cases in groups.values():
+        if len(cases) < 2:
+            continue
+        shortest = min(cases, key=lambda case: case['minutes'])
+        longest = max(cases, key=lambda case: case['minutes'])
+        limit = shortest['peak_mb'] * (1 + tolerance) + MIN_PEAK_GROWTH_MB
+        if longest['peak_mb'] > limit:
+            growths.append(
+                f"{longest['name']} peak: {longest['peak_mb']:.1f}MB > {limit:.1f}MB "
+                f"({shortest['name']} {shortest['peak_mb']:.1f}MB)"
+            )
+    return growths
+
+def main():
+    parser = argparse.ArgumentParser(description="合成音源による楽曲解析ベンチマーク")
+    parser.add_argument("--lengths", type=float, nargs="+", default=[1, 5, 30],
+                        help="合成音源の長さ（分）")
+    parser.add_argument("--repeat", type=int, default=1, help="各ケースの計測回数（最小値を採用）")
+    parser.add_argument("--profile", default=None, help="解析プロファイル（fast / full）")
+    parser.add_argument("--streaming", action="store_true", help="ストリーミング解析を計測する")
+    parser.add_argument("--warm-pcm", action="store_true",
+                        help="デコード済みPCMのキャッシュがある状態（再解析）を計測する")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="ベースラインのJSONファイル")
+    parser.add_argument("--save-baseline", action="store_true", help="今回の結果をベースラインとして保存")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="ベースラインからの許容増加率（0.2で20%%）")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    args = parser.parse_args()
+
+    analyzer = SongAnalyzer()
+    if args.profile:
+        analyzer.profile = args.profile
+    analyzer.streaming = args.streaming
+    # 利用者のキャッシュを汚さないよう一時ディレクトリに書き込む
+    cache_dir = tempfile.mkdtemp(prefix="bench_analyzer_")
+    analyzer.cache = AnalysisCache(cache_dir)
+    analyzer.pcm_cache = PCMCache(os.path.join(cache_dir, "pcm"))
+    try:
+        warm_up(analyzer)
+        results = [
+            run_case(analyzer, kind, minutes, bpm, args.repeat, args.warm_pcm)
+            for kind, minutes, bpm in build_cases(args.lengths)
+        ]
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for case in results:
+            stages = " / ".join(
+                f"{name} {seconds:.3f}" for name, seconds in case['stages_s'].items() if name != 'total'
+            )
+            expected = f" (期待値 {case['bpm']})" if case['bpm'] else ""
+            print(f"{case['name']}: 合計 {case['stages_s']['total']:.2f}s  "
+                  f"実時間比 x{case['realtime_factor']:.0f}  ピーク {case['peak_mb']:.1f}MB  "
+                  f"テンポ {case['tempo']:.1f}{expected}")
+            print(f"  段階別(s): {stages}")
+
+    if args.streaming:
+        growths = check_flat_memory(results, args.tolerance)
+        for line in growths:
+            print(f"メモリ使用量が曲の長さに比例しています: {line}", file=sys.stderr)
+        if growths:
+            sys.exit(1)
+
+    baseline = load_json(args.baseline)
+    if args.save_baseline:
+        baseline.update({baseline_key(case): case for case in results})
+        save_json(args.baseline, baseline)
+        print(f"ベースラインを保存しました: {args.baseline}", file=sys.stderr)
+        return
+
+    # 比較できないまま成功扱いにすると、閾値がどこでも効かなくなる
+    if not any(baseline_key(case) in baseline for case in results):
+        print(f"ベースラインに今回のケースがありません（--save-baselineで作成）: {args.baseline}",
+              file=sys.stderr)
+        sys.exit(2)
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"性能低下: {line}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
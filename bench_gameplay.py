@@ -0,0 +1,175 @@
+"""ヘッドレスでGameRunnerのゲームループを計測するベンチマーク
+
+SDLのダミードライバで画面・音声なしに譜面を再生し、自動プレイヤーが
+各パターンに合わせてジャンプする。仮想時計を1フレームずつ進めるので
+フレームレート上限なしで曲の長さより短い時間で計測できる。
+
+    python bench_gameplay.py --chart chart.npy
+    python bench_gameplay.py --synthetic 2000 --interval 0.5 --max-p99-ms 8
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+# --jsonの出力をそのまま読めるよう、pygameの起動メッセージを標準出力に出さない
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import json
+import sys
+import time
+import numpy as np
+import pygame
+from typing import Dict, Optional
+from chart import empty_chart, import_json, load_chart
+from game_runner import GameRunner
+
+class HeadlessGameRunner(GameRunner):
+    """ダミードライバ上で仮想時計と自動プレイヤーを使って譜面を再生する"""
+
+    def __init__(self, fps: float = 60.0, invincible: bool = True):
+        self.virtual_ticks = 0.0
+        self.frame_ms = 1000.0 / fps
+        super().__init__()
+        # 仮想時計ではカウントダウンが一瞬で終わるので、読み込み待ちを計測に含めないよう先に済ませる
+        self.finish_loading_assets(wait=True)
+        self.frame_rate = 0
+        self.invincible = invincible
+        self.frame_times = []
+        self._last_frame = None
+
+    def setup_display(self) -> None:
+        self.scale_factor = 1.0
+        self.width = self.base_width
+        self.height = self.base_height
+        self.screen = pygame.display.set_mode((self.width, self.height))
+
+    def get_ticks(self) -> int:
+        return int(self.virtual_ticks)
+
+    def run(self, song_path: Optional[str], rhythm_data: Dict) -> None:
+        # 全フレームを集計できるように、曲の長さ+余裕分のバッファを確保する
+        chart = rhythm_data['chart']
+        last = float(chart['jump_time'].max()) if len(chart) else 0.0
+        self.profiler_capacity = int((last + 10) * 1000 / self.frame_ms)
+        self.jump_schedule = self.build_jump_schedule(rhythm_data['chart']['jump_time'])
+        self.jump_index = 0
+        self.frame_times = []
+        self._last_frame = None
+        super().run(song_path, rhythm_data)
+
+    def build_jump_schedule(self, jump_times: np.ndarray) -> np.ndarray:
+        """各パターンのjump_time（障害物の出現時刻）から、障害物を跳び越せる踏み切り時刻を求める"""
+        speed = self.settings['obstacle_speed']
+        player_dx, _, player_width, _ = self.get_hitbox(48 * self.scale_factor, 64 * self.scale_factor)
+        obstacle_dx, _, obstacle_width, _ = self.get_hitbox(*self.obstacle_size)
+        player_left = self.player['x'] + player_dx
+        # 障害物の当たり判定がプレイヤーの当たり判定を横切る区間の中央で頂点に達するように跳ぶ
+        enter = (self.width + obstacle_dx - (player_left + player_width)) / speed
+        leave = (self.width + obstacle_dx + obstacle_width - player_left) / speed
+        apex_time = -self.settings['jump_speed'] / self.settings['gravity']
+        return np.sort(np.asarray(jump_times, dtype=float)) + (enter + leave) / 2 - apex_time
+
+    def handle_events(self) -> bool:
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            self.frame_times.append(now - self._last_frame)
+        self._last_frame = now
+        self.virtual_ticks += self.frame_ms
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return True
+
+        # 地上にいれば予定時刻を過ぎた分だけ踏み切る
+        song_time = (self.virtual_ticks - self.bench_start_ticks) / 1000
+        if (self.jump_index < len(self.jump_schedule) and
+                song_time >= self.jump_schedule[self.jump_index] and
+                self.player['y'] >= self.ground_y):
+            self.player['velocity'] = self.settings['jump_speed'] * self.scale_factor
+            while (self.jump_index < len(self.jump_schedule) and
+                   song_time >= self.jump_schedule[self.jump_index]):
+                self.jump_index += 1
+        return self.game_over or self.game_clear
+
+    def reset_game_state(self) -> None:
+        super().reset_game_state()
+        # run()はリセット直後に開始時刻を「現在+3秒」に設定する
+        self.bench_start_ticks = self.virtual_ticks + 3000
+
+def load_bench_chart(path: str) -> np.ndarray:
+    """.npyの譜面配列、またはJSON形式のリズムデータを読み込む"""
+    if path.endswith('.json'):
+        return import_json(path)['chart']
+    return load_chart(path, mmap=False)
+
+def synthetic_chart(count: int, interval: float, start: float = 1.0) -> np.ndarray:
+    """一定間隔で障害物が並ぶ譜面を生成"""
+    chart = empty_chart(count)
+    chart['jump_time'] = start + np.arange(count) * interval
+    return chart
+
+def run_benchmark(chart: np.ndarray, song_path: Optional[str] = None,
+                  fps: float = 60.0, invincible: bool = True,
+                  profile: bool = False) -> Dict:
+    """譜面を再生してフレーム時間などの統計を返す（profileでフェーズ別の内訳も計測）"""
+    runner = HeadlessGameRunner(fps=fps, invincible=invincible)
+    runner.profiler.enabled = profile
+    started = time.perf_counter()
+    runner.run(song_path, {'chart': chart})
+    elapsed = time.perf_counter() - started
+    frame_ms = np.array(runner.frame_times) * 1000 if runner.frame_times else np.zeros(1)
+    result = {
+        'frames': len(runner.frame_times),
+        'wall_time_s': elapsed,
+        'frame_ms': {
+            'mean': float(frame_ms.mean()),
+            'p50': float(np.percentile(frame_ms, 50)),
+            'p95': float(np.percentile(frame_ms, 95)),
+            'p99': float(np.percentile(frame_ms, 99)),
+            'max': float(frame_ms.max())
+        },
+        'obstacles': int(runner.rhythm_index),
+        'passed': int(runner.passed_count),
+        'collisions': int(runner.collisions),
+        'cleared': bool(runner.game_clear)
+    }
+    if profile:
+        result['phases_ms'] = runner.profiler.summary()['phases_ms']
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="ヘッドレスのゲームループベンチマーク")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--chart", help="譜面ファイル（.npy または JSON）")
+    source.add_argument("--synthetic", type=int, help="一定間隔の合成譜面の障害物数")
+    parser.add_argument("--interval", type=float, default=0.8, help="合成譜面の障害物間隔（秒）")
+    parser.add_argument("--song", default=None, help="一緒に再生する音声ファイル（省略可）")
+    parser.add_argument("--fps", type=float, default=60.0, help="仮想時計のフレームレート")
+    parser.add_argument("--no-invincible", action="store_true", help="衝突したら終了する")
+    parser.add_argument("--max-p99-ms", type=float, default=None,
+                        help="p99フレーム時間がこれを超えたら終了コード1")
+    parser.add_argument("--profile", action="store_true", help="フェーズ別の平均処理時間も計測する")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    args = parser.parse_args()
+
+    chart = load_bench_chart(args.chart) if args.chart else synthetic_chart(args.synthetic, args.interval)
+    result = run_benchmark(chart, args.song, args.fps, not args.no_invincible, args.profile)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        frame = result['frame_ms']
+        print(f"フレーム数: {result['frames']}  実時間: {result['wall_time_s']:.2f}s")
+        print(f"フレーム時間(ms): 平均 {frame['mean']:.3f} / p50 {frame['p50']:.3f} / "
+              f"p95 {frame['p95']:.3f} / p99 {frame['p99']:.3f} / 最大 {frame['max']:.3f}")
+        print(f"障害物: {result['obstacles']}  通過: {result['passed']}  衝突: {result['collisions']}")
+        if 'phases_ms' in result:
+            print("フェーズ別平均(ms): " + " / ".join(
+                f"{name} {ms:.3f}" for name, ms in result['phases_ms'].items()
+            ))
+
+    if args.max_p99_ms is not None and result['frame_ms']['p99'] > args.max_p99_ms:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""プレイリスト・チャンネル・URLリストからの一括取り込み
+
+URLは最初にyt-dlpのフラット抽出で動画単位の項目に展開し（ダウンロードはしない）、
+取り込み済みアーカイブにある動画を除いてからジョブキューに渡す。展開した項目と
+その状態は取り込みごとにファイルへ保存するので、途中で終了しても完了した項目を
+繰り返さずに再開できる。再開するのは終了で中断した項目と失敗した項目だけで、
+利用者がキャンセルした項目と、上限回数まで失敗した項目（削除・非公開の動画など）は
+打ち切る。
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+from utils import atomic_write, load_json
+from config import BULK_IMPORT_SETTINGS
+
+# 終了後に再投入しない項目の状態（利用者がキャンセルした項目も含む）
+COMPLETED_STATUSES = ("done", "skipped", "cancelled")
+
+def archive_key(info: Dict) -> Optional[str]:
+    """yt-dlpの情報からアーカイブのキー（"<抽出器名> <動画ID>"）を作る"""
+    extractor = info.get('ie_key') or info.get('extractor_key')
+    video_id = info.get('id')
+    if not extractor or not video_id:
+        return None
+    return f"{extractor.lower()} {video_id}"
+
+def read_url_list(filepath: str) -> List[str]:
+    """1行1URLのテキストファイルを読む（空行と#で始まる行は無視）"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith('#')]
+
+def _is_container(entry: Dict) -> bool:
+    """フラット抽出で中身が展開されずに返るチャンネルのタブやプレイリストか"""
+    extractor = entry.get('ie_key') or ''
+    return entry.get('_type') == 'url' and extractor.endswith(('Tab', 'Playlist'))
+
+def expand_sources(sources: Iterable[str]) -> List[Dict]:
+    """URL（動画・プレイリスト・チャンネル）を動画単位の項目に展開する
+
+    同じ動画が複数のURLに含まれていても1項目にまとめる。
+    """
+    import yt_dlp  # 読み込みに時間がかかるので使うときだけ
+    ydl_opts = {'extract_flat': 'in_playlist', 'skip_download': True, 'quiet': True}
+    items = []
+    seen = set()
+
+    def collect(info: Dict) -> None:
+        if info.get('_type') in ('playlist', 'multi_video'):
+            for entry in info.get('entries') or []:
+                if entry:
+                    collect(ydl.extract_info(entry['url'], download=False)
+                            if _is_container(entry) else entry)
+            return
+        url = info.get('webpage_url') or info.get('url')
+        key = archive_key(info)
+        if not url or (key or url) in seen:
+            return
+        seen.add(key or url)
+        items.append({'url': url, 'key': key, 'title': info.get('title') or url,
+                      'status': 'pending', 'error': None, 'attempts': 0})
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        for source in sources:
+            collect(ydl.extract_info(source, download=False))
+    return items
+
+class DownloadArchive:
+    """取り込み済みの動画を記録するファイル
+
+    形式はyt-dlpの--download-archiveと同じ（1行に"<抽出器名> <動画ID>"）。
+    解析してライブラリに登録できた動画だけを追記するので、ダウンロードや解析に
+    失敗した動画は次回また取り込まれる。
+    """
+
+    def __init__(self, filepath: str = BULK_IMPORT_SETTINGS['archive']):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                self._keys = {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            self._keys = set()
+
+    def __contains__(self, key: Optional[str]) -> bool:
+        with self._lock:
+            return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: str) -> None:
+        """キーを追記（追記だけなので途中で終了しても既存の行は壊れない）"""
+        with self._lock:
+            if key in self._keys:
+                return
+            os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+            with open(self.filepath, 'a', encoding='utf-8') as f:
+                f.write(key + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._keys.add(key)
+
+class ImportBatch:
+    """1回の一括取り込みで展開した項目と、その進行状況"""
+
+    def __init__(self, filepath: str, sources: List[str], items: List[Dict],
+                 max_attempts: int = BULK_IMPORT_SETTINGS['max_attempts']):
+        self.id = os.path.splitext(os.path.basename(filepath))[0]
+        self.filepath = filepath
+        self.sources = sources
+        self.items = items
+        self.max_attempts = max_attempts
+        # ジョブの終了はワーカースレッドから通知されるので、状態の更新と保存をまとめて排他する
+        self._lock = threading.RLock()
+
+    @classmethod
+    def create(cls, batch_dir: str, sources: List[str], items: List[Dict]) -> "ImportBatch":
+        os.makedirs(batch_dir, exist_ok=True)
+        batch_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        batch = cls(os.path.join(batch_dir, f"{batch_id}.json"), sources, items)
+        batch.save()
+        return batch
+
+    @classmethod
+    def load(cls, filepath: str) -> "ImportBatch":
+        data = load_json(filepath)
+        return cls(filepath, data.get('sources', []), data.get('items', []))
+
+    def save(self) -> None:
+        """進行状況をアトミックに書き込む"""
+        with self._lock:
+            data = json.dumps({'sources': self.sources, 'items': self.items}, ensure_ascii=False, indent=2)
+            atomic_write(self.filepath, lambda f: f.write(data.encode('utf-8')))
+
+    def is_completed(self, item: Dict) -> bool:
+        """再投入しない項目か（失敗は上限回数に達したら打ち切る）"""
+        if item['status'] == 'failed':
+            return item.get('attempts', 0) >= self.max_attempts
+        return item['status'] in COMPLETED_STATUSES
+
+    def pending_items(self) -> List[Dict]:
+        """まだ完了していない項目（中断した項目と、上限回数に達していない失敗した項目も含む）"""
+        return [item for item in self.items if not self.is_completed(item)]
+
+    @property
+    def finished(self) -> bool:
+        return not self.pending_items()
+
+    def mark(self, url: str, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            for item in self.items:
+                if item['url'] == url:
+                    item['status'] = status
+                    item['error'] = error
+                    if status == 'failed':
+                        item['attempts'] = item.get('attempts', 0) + 1
+            self.save()
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for item in self.items:
+            counts[item['status']] = counts.get(item['status'], 0) + 1
+        return counts
+
+class BulkImporter:
+    """一括取り込みを展開・重複除去してジョブキューに流し、結果を記録する
+
+    ダウンロードの同時実行数はジョブキューのダウンロード用ワーカー数で決まる。
+    """
+
+    def __init__(self, job_queue, archive: Optional[DownloadArchive] = None,
+                 batch_dir: str = BULK_IMPORT_SETTINGS['batch_dir']):
+        self.job_queue = job_queue
+        self.archive = archive if archive is not None else DownloadArchive()
+        self.batch_dir = batch_dir
+        self.batches: Dict[str, ImportBatch] = {}
+        job_queue.add_listener(self._on_job_finished)
+
+    def start(self, sources: List[str]) -> ImportBatch:
+        """URLを展開して取り込みを始める（展開に通信するので呼び出し元は待たされる）"""
+        batch = ImportBatch.create(self.batch_dir, list(sources), expand_sources(sources))
+        self.submit(batch)
+        return batch
+
+    def start_async(self, sources: List[str],
+                    on_started: Optional[Callable[[Optional[ImportBatch], Optional[str]], None]] = None) -> None:
+        """startをバックグラウンドスレッドで行い、終わったらon_started(batch, error)を呼ぶ"""
+        def run() -> None:
+            try:
+                batch = self.start(sources)
+            except Exception as e:
+                if on_started:
+                    on_started(None, str(e))
+                return
+            if on_started:
+                on_started(batch, None)
+        threading.Thread(target=run, name="bulk-import", daemon=True).start()
+
+    def submit(self, batch: ImportBatch) -> int:
+        """未完了の項目をジョブキューに入れ、入れた数を返す（取り込み済みの動画は飛ばす）"""
+        self.batches[batch.id] = batch
+        submitted = 0
+        for item in batch.pending_items():
+            if item['key'] and item['key'] in self.archive:
+                item['status'] = 'skipped'
+                continue
+            item['status'] = 'queued'
+            self.job_queue.submit(item['url'], key=item['key'], batch_id=batch.id)
+            submitted += 1
+        batch.save()
+        self._cleanup(batch)
+        return submitted
+
+    def resume(self) -> List[ImportBatch]:
+        """中断した取り込みを読み込み、完了していない項目を再投入する"""
+        if not os.path.isdir(self.batch_dir):
+            return []
+        resumed = []
+        for name in sorted(os.listdir(self.batch_dir)):
+            if not name.endswith('.json'):
+                continue
+            batch = ImportBatch.load(os.path.join(self.batch_dir, name))
+            if batch.id in self.batches:
+                continue
+            self.submit(batch)
+            resumed.append(batch)
+        return resumed
+
+    def _on_job_finished(self, job) -> None:
+        if job.status == "done" and job.key:
+            self.archive.add(job.key)
+        batch = self.batches.get(job.batch_id)
+        if batch is None:
+            return
+        batch.mark(job.source, job.status, job.error)
+        self._cleanup(batch)
+
+    def _cleanup(self, batch: ImportBatch) -> None:
+        """全項目が完了した取り込みは再開の必要がないので進行状況ファイルを消す"""
+        if batch.finished:
+            try:
+                os.remove(batch.filepath)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,143 @@
+import json
+import numpy as np
+from typing import Dict, List
+from utils import atomic_write
+
+# 譜面の列形式表現（1行 = 1障害物）
+CHART_DTYPE = np.dtype([
+    ('jump_time', '<f8'),
+    ('obstacle_time', '<f8'),
+    ('start_time', '<f8'),
+    ('end_time', '<f8'),
+    ('rhythm_strength', '<f8')
+])
+
+def empty_chart(size: int = 0) -> np.ndarray:
+    """空の譜面配列を作成"""
+    return np.zeros(size, dtype=CHART_DTYPE)
+
+def patterns_to_chart(patterns: List[Dict]) -> np.ndarray:
+    """辞書のリスト形式のリズムパターンを譜面配列に変換"""
+    chart = empty_chart(len(patterns))
+    for name in CHART_DTYPE.names:
+        chart[name] = [pattern[name] for pattern in patterns]
+    return chart
+
+def chart_to_patterns(chart: np.ndarray) -> List[Dict]:
+    """譜面配列を辞書のリスト形式に変換（JSONエクスポート用）"""
+    columns = [chart[name].tolist() for name in CHART_DTYPE.names]
+    return [
+        dict(zip(CHART_DTYPE.names, row), variation="normal")
+        for row in zip(*columns)
+    ]
+
+def save_chart(filepath: str, chart: np.ndarray) -> None:
+    """譜面配列を.npyとしてアトミックに保存"""
+    atomic_write(filepath, lambda f: np.save(f, np.ascontiguousarray(chart, dtype=CHART_DTYPE)))
+
+def load_chart(filepath: str, mmap: bool = True) -> np.ndarray:
+    """.npyの譜面配列を読み込む（既定ではメモリマップ）"""
+    return np.load(filepath, mmap_mode='r' if mmap else None)
+
+def export_json(filepath: str, rhythm_data: Dict) -> None:
+    """リズムデータを従来のJSON形式で書き出す"""
+    data = {key: value for key, value in rhythm_data.items() if key not in ('chart', 'features')}
+    data['rhythm_patterns'] = chart_to_patterns(rhythm_data['chart'])
+    with open(filepath, 'w') as f:
+        json.dump(data, f, indent=2)
+
+def import_json(filepath: str) -> Dict:
+    """従来のJSON形式のリズムデータを読み込み、譜面配列に変換"""
+    with open(filepath, 'r') as f:
+        data = json.load(f)
+    return from_legacy(data)
+
+def from_legacy(data: Dict) -> Dict:
+    """rhythm_patternsを持つ従来形式の辞書を譜面配列形式に変換"""
+    data = dict(data)
+    data['chart'] = patterns_to_chart(data.pop('rhythm_patterns', []))
+    return data
+
+# 譜面の元になる特徴量（1要素 = 1オンセット。物理・難易度の設定には依存しない）
+FEATURE_ARRAYS = ('onset_times', 'onset_scores', 'beat_scores', 'chroma_scores', 'mfcc_scores', 'beat_times')
+FEATURE_SCALARS = ('duration', 'tempo')
+
+def save_features(filepath: str, features: Dict) -> None:
+    """特徴量を.npzとしてアトミックに保存"""
+    atomic_write(filepath, lambda f: np.savez(
+        f, **{name: features[name] for name in FEATURE_ARRAYS + FEATURE_SCALARS}
+    ))
+
+def load_features(filepath: str) -> Dict:
+    """save_featuresで保存した特徴量を読み込む"""
+    with np.load(filepath) as npz:
+        features = {name: npz[name] for name in FEATURE_ARRAYS}
+        features.update({name: npz[name].item() for name in FEATURE_SCALARS})
+    return features
+
+def make_chart(obstacle_times: np.ndarray, apex_time: float, rhythm_strengths) -> np.ndarray:
+    """障害物の時刻から譜面配列を作成"""
+    chart = empty_chart(len(obstacle_times))
+    jump_times = obstacle_times - apex_time
+    chart['jump_time'] = jump_times
+    chart['obstacle_time'] = obstacle_times
+    chart['start_time'] = jump_times - 0.2
+    chart['end_time'] = jump_times + 0.2
+    chart['rhythm_strength'] = rhythm_strengths
+    return chart
+
+def select_min_interval(times: np.ndarray, min_interval: float) -> List[int]:
+    """直前に採用した時刻からmin_interval以上離れた時刻のインデックスを返す"""
+    selected = []
+    last_time = -min_interval
+    for i, time in enumerate(times.tolist()):
+        if time - last_time >= min_interval:
+            selected.append(i)
+            last_time = time
+    return selected
+
+def add_additional_patterns(chart: np.ndarray, target_points: int,
+                            song_duration: float, apex_time: float) -> np.ndarray:
+    """追加のリズムポイントを挿入"""
+    if len(chart) >= target_points:
+        return chart
+    
+    additional_points = target_points - len(chart)
+    interval = song_duration / additional_points
+    times = []
+    for i in range(additional_points):
+        # 追加した点の数だけ後ろにずらす（従来の挙動を維持）
+        time = (len(chart) + len(times) + i + 1) * interval
+        if time > song_duration:
+            break
+        if time - apex_time > 0:
+            times.append(time)
+    
+    additional = make_chart(np.array(times), apex_time, 0.5)
+    # 追加した点を時刻順に差し込む（同時刻なら元のパターンを先にする）
+    merged = np.concatenate([chart, additional])
+    return merged[np.argsort(merged['jump_time'], kind='stable')]
+
+def compile_chart(features: Dict, jump_speed: float, gravity: float, min_interval: float) -> np.ndarray:
+    """特徴量と物理・難易度の設定から譜面配列を組み立てる
+
+    音声の解析をやり直さずに済むので、設定を変えても数ミリ秒で作り直せる。
+    """
+    apex_time = jump_speed / gravity
+    onset_times = features['onset_times']
+    
+    # ジャンプ開始が曲の前になるオンセットは採用されないので先に除外し、
+    # 最小間隔フィルタだけを逐次処理する
+    keep = np.flatnonzero(onset_times - apex_time > 0)
+    keep = keep[select_min_interval(onset_times[keep], min_interval)]
+    
+    beat_scores = features['beat_scores'][keep]
+    if len(features['chroma_scores']) and len(features['mfcc_scores']):
+        rhythm_strengths = (features['chroma_scores'][keep] + features['mfcc_scores'][keep] + beat_scores) / 3
+    else:
+        # fastプロファイルでは音色特徴の代わりに正規化したオンセット強度を使う
+        rhythm_strengths = (features['onset_scores'][keep] + beat_scores) / 2
+    
+    chart = make_chart(onset_times[keep], apex_time, rhythm_strengths)
+    duration = features['duration']
+    return add_additional_patterns(chart, int(duration / 2), duration, apex_time)
@@ -5,6 +5,7 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ASSETS_DIR = os.path.join(BASE_DIR, "assets")
 SONGS_DIR = os.path.join(BASE_DIR, "songs")
 CACHE_DIR = os.path.join(BASE_DIR, "cache")
+LIBRARY_DB = os.path.join(SONGS_DIR, "library.db")
 
 # ゲーム設定のデフォルト値
 DEFAULT_SETTINGS = {
@@ -22,6 +23,117 @@ ASSET_PATHS = {
     "obstacles": os.path.join(ASSETS_DIR, "obstacles")
 }
 
+# ゲーム画面の画像と、拡大縮小済み画像のキャッシュ
+IMAGES_DIR = os.path.join(ASSETS_DIR, "images")
+ASSET_CACHE_DIR = os.path.join(CACHE_DIR, "assets")
+
 # フォントパスの追加
 FONT_DIR = os.path.join(ASSETS_DIR, "fonts")
 DEFAULT_FONT = os.path.join(FONT_DIR, "NotoSansJP-Regular.ttf")
+
+# 解析キャッシュ設定
+ANALYSIS_CACHE_DIR = os.path.join(CACHE_DIR, "analysis")
+ANALYSIS_CACHE_SETTINGS = {
+    "max_entries": 500,
+    "max_bytes": 256 * 1024 * 1024
+}
+
+# デコード済みPCMのキャッシュ設定（再解析時にデコードとリサンプリングを省く）
+PCM_CACHE_DIR = os.path.join(CACHE_DIR, "pcm")
+PCM_CACHE_SETTINGS = {
+    "enabled": True,
+    "max_entries": 200,
+    "max_bytes": 2 * 1024 * 1024 * 1024
+}
+
+# 楽曲解析設定
+ANALYSIS_SETTINGS = {
+    "profile": "full",            # ANALYSIS_PROFILESのキー
+    "streaming": False,           # Trueでブロック単位のストリーミング解析を行う
+    "stream_block_seconds": 10.0  # ストリーミング時に一度に読み込む秒数
+}
+
+# 解析プロファイル（計算する特徴量の組み合わせ）
+# fast: オンセットとビートのみ / full: クロマ・MFCCも使って強度を算出
+ANALYSIS_PROFILES = {
+    "fast": {"chroma": False, "mfcc": False},
+    "full": {"chroma": True, "mfcc": True}
+}
+
+# 譜面生成の設定（特徴量から譜面を組み立てるときに使う）
+CHART_SETTINGS = {
+    "jump_speed": 15,
+    "gravity": 0.8,
+    "obstacle_speed": 5,
+    "min_interval": 0.8   # 障害物の最小間隔（秒）
+}
+
+# 難易度ごとにCHART_SETTINGSを上書きする値（曲の登録時に全難易度の譜面を作っておく）
+DIFFICULTY_PRESETS = {
+    "easy": {"min_interval": 1.2},
+    "normal": {"min_interval": 0.8},
+    "hard": {"min_interval": 0.5}
+}
+
+# YouTubeからのダウンロード設定
+# audio_format:
+#   "native" 配信されている音声をそのまま取り出す（コンテナの詰め替えのみで再エンコードしない）。
+#            native_codecs以外（AACなど）しかない動画はwavに展開する
+#   "wav"    非圧縮のWAVに展開する（ファイルは大きいが解析時に再デコードが要らない）
+#   "mp3"    従来どおりMP3に再エンコードする
+DOWNLOAD_SETTINGS = {
+    "audio_format": "native",
+    "format": "bestaudio[acodec=opus]/bestaudio[acodec=vorbis]/bestaudio/best",
+    # pygame（SDL_mixer）で再生でき、libsndfileでストリーミング解析できるコーデック
+    "native_codecs": ("opus", "vorbis")
+}
+
+# 一括解析設定
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".opus", ".flac", ".m4a", ".webm")
+BATCH_ANALYSIS_WORKERS = None  # Noneの場合はCPUコア数
+
+# ダウンロード・解析ジョブの同時実行数
+JOB_QUEUE_WORKERS = 1      # 解析（CPUを使う）
+DOWNLOAD_WORKERS = 3       # ダウンロード（通信待ちが主なので解析より多く並べる）
+
+# プレイリスト・チャンネル・URLリストの一括取り込み
+BULK_IMPORT_SETTINGS = {
+    # 取り込み済み動画のID（yt-dlpの--download-archiveと同じ形式なので共用できる）
+    "archive": os.path.join(SONGS_DIR, "download_archive.txt"),
+    # 中断した取り込みを再開するための進行状況ファイルの置き場所
+    "batch_dir": os.path.join(CACHE_DIR, "imports"),
+    "resume_on_start": True,   # メニュー起動時に中断した取り込みを再開する
+    "max_attempts": 3          # 失敗した項目を取り込み直す回数の上限（削除・非公開の動画など）
+}
+
+# ゲームループ設定
+GAME_LOOP_SETTINGS = {
+    "fixed_timestep": 1 / 120,  # シミュレーションの固定ステップ（秒）
+    "frame_rate": 60,           # 描画フレームレートの上限（0で無制限）
+    "max_catchup": 0.25         # これ以上遅れた分の物理演算は捨てて音楽に合わせる（秒）
+}
+
+# 描画設定
+RENDER_SETTINGS = {
+    "dirty_rects": False  # 背景画像がない場合に変更箇所だけ画面を更新する
+}
+
+# フレームプロファイラ設定（ゲーム中にF3で切り替え）
+PROFILER_SETTINGS = {
+    "enabled": False,   # 起動時から計測してオーバーレイを表示する
+    "capacity": 600,    # 保持するフレーム数
+    "dump_path": None   # 指定するとプレイ終了時に計測結果を書き出す（.csv / .json）
+}
+
+# メニュー画面の設定（入力を待つ間はスリープしてCPUを使わない）
+MENU_SETTINGS = {
+    "frame_rate": 30,           # 描画フレームレートの上限
+    "poll_interval_ms": 200,    # 入力がなくてもジョブの進捗などを確認する間隔
+    "report_cpu_interval": None # 秒数を指定するとメニューのCPU使用率を定期的に表示する
+}
+
+# 起動設定
+STARTUP_SETTINGS = {
+    "first_frame_target_ms": 1000,  # タイトル画面の表示までの目標時間（超えたら起動時間を表示）
+    "warm_up": True                 # タイトル表示後に解析器などをバックグラウンドで準備する
+}
@@ -0,0 +1,102 @@
+import csv
+import json
+import time
+import numpy as np
+from typing import Dict, List, Optional
+
+# 計測するフェーズ（run()内の処理順）
+PHASES = ('events', 'physics', 'obstacles', 'collisions', 'draw', 'present', 'wait')
+EVENTS, PHYSICS, OBSTACLES, COLLISIONS, DRAW, PRESENT, WAIT = range(len(PHASES))
+
+class FrameProfiler:
+    """フレームごとのフェーズ別処理時間をリングバッファに記録する
+
+    無効時は各計測点でフラグを見るだけなので、ほぼオーバーヘッドはない。
+    """
+
+    def __init__(self, capacity: int = 600, enabled: bool = False):
+        self.enabled = enabled
+        self.reset(capacity)
+
+    def reset(self, capacity: Optional[int] = None) -> None:
+        """記録を消去（capacityを指定するとバッファの大きさも変える）"""
+        if capacity is not None:
+            self.capacity = max(1, capacity)
+        # 各行: フェーズごとの秒数 + フレーム全体の秒数
+        self.samples = np.zeros((self.capacity, len(PHASES) + 1))
+        self.index = 0
+        self.count = 0
+        self._current = [0.0] * len(PHASES)
+        self._frame_start = 0.0
+        self._last_mark = 0.0
+
+    def toggle(self) -> None:
+        self.enabled = not self.enabled
+        self._frame_start = 0.0
+
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._frame_start:
+            self._store(now)
+        self._frame_start = self._last_mark = now
+        self._current = [0.0] * len(PHASES)
+
+    def mark(self, phase: int) -> None:
+        """前回の計測点からの経過時間をphaseに加算"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._current[phase] += now - self._last_mark
+        self._last_mark = now
+
+    def _store(self, now: float) -> None:
+        row = self.samples[self.index]
+        row[:-1] = self._current
+        row[-1] = now - self._frame_start
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def recent(self) -> np.ndarray:
+        """記録済みのサンプルを古い順に返す"""
+        if self.count < self.capacity:
+            return self.samples[:self.count]
+        return np.roll(self.samples, -self.index, axis=0)
+
+    def summary(self) -> Dict:
+        """FPS・p99フレーム時間・フェーズ別平均時間（ミリ秒）を返す"""
+        samples = self.recent()
+        if not len(samples):
+            return {'fps': 0.0, 'p99_ms': 0.0, 'phases_ms': {name: 0.0 for name in PHASES}}
+        totals = samples[:, -1]
+        means = samples[:, :-1].mean(axis=0) * 1000
+        return {
+            'fps': float(1.0 / totals.mean()) if totals.mean() > 0 else 0.0,
+            'p99_ms': float(np.percentile(totals, 99) * 1000),
+            'phases_ms': dict(zip(PHASES, means.tolist()))
+        }
+
+    def hud_lines(self) -> List[str]:
+        """オーバーレイ表示用の文字列"""
+        summary = self.summary()
+        lines = [f"FPS {summary['fps']:.1f}  p99 {summary['p99_ms']:.2f}ms"]
+        lines += [f"{name} {ms:.2f}ms" for name, ms in summary['phases_ms'].items()]
+        return lines
+
+    def dump(self, filepath: str) -> None:
+        """記録済みのサンプルをCSVまたはJSON（拡張子で判定）に書き出す"""
+        samples = self.recent() * 1000
+        columns = list(PHASES) + ['total']
+        if filepath.endswith('.json'):
+            with open(filepath, 'w') as f:
+                json.dump({
+                    'unit': 'ms',
+                    'summary': self.summary(),
+                    'frames': [dict(zip(columns, row)) for row in samples.tolist()]
+                }, f, indent=2)
+        else:
+            with open(filepath, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(samples.tolist())
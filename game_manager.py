@@ -1,36 +1,99 @@
-from song_analyzer import SongAnalyzer
 from song_library import SongLibrary
-from game_runner import GameRunner
+from library_scanner import LibraryScanner, ScanResult
+from config import DEFAULT_SETTINGS
 import os
+import threading
 from typing import Dict, Optional
 
 class GameManager:
+    """ライブラリ・解析・ゲーム本体をまとめる
+
+    librosaを使う解析器と全画面表示に切り替えるゲーム本体は起動を遅くするので、
+    初回使用時（またはwarm_up()）まで生成しない。
+    """
+
     def __init__(self):
-        self.song_analyzer = SongAnalyzer()
-        self.game_runner = GameRunner()
         self.song_library = SongLibrary()
+        self.library_scanner = LibraryScanner(self.song_library)
+        self._song_analyzer = None
+        self._game_runner = None
+        self._analyzer_lock = threading.Lock()
+        self.difficulty = DEFAULT_SETTINGS['difficulty']
+        self.chart_params: Dict = {}
+    
+    @property
+    def song_analyzer(self):
+        """楽曲解析器（ジョブのワーカーからも呼ばれるのでロックして1つだけ生成）"""
+        with self._analyzer_lock:
+            if self._song_analyzer is None:
+                from song_analyzer import SongAnalyzer
+                self._song_analyzer = SongAnalyzer()
+            return self._song_analyzer
+    
+    @property
+    def game_runner(self):
+        """ゲーム本体（画面モードを切り替えるのでメインスレッドから使う）"""
+        if self._game_runner is None:
+            from game_runner import GameRunner
+            self._game_runner = GameRunner()
+        return self._game_runner
+    
+    def warm_up(self) -> None:
+        """重いモジュールの読み込みと解析器の生成を済ませておく（バックグラウンドスレッド用）"""
+        import yt_dlp  # noqa: F401
+        self.song_analyzer.warm_up()
         
-    def download_and_analyze_song(self, youtube_url: str, progress_callback=None) -> str:
-        """YouTubeから楽曲をダウンロードして解析"""
+    def download_song(self, youtube_url: str, progress_callback=None) -> str:
+        """YouTubeから楽曲をダウンロードして保存先のパスを返す（進捗は0-100%）"""
+        def download_hook(status: Dict) -> None:
+            total = status.get('total_bytes') or status.get('total_bytes_estimate')
+            if progress_callback and status.get('status') == 'downloading' and total:
+                progress_callback("楽曲をダウンロード中...",
+                                  int(status.get('downloaded_bytes', 0) / total * 100))
+
         if progress_callback:
             progress_callback("楽曲をダウンロード中...", 0)
-            
-        song_path = self.song_library.download_from_youtube(youtube_url)
+        return self.song_library.download_from_youtube(youtube_url, download_hook)
         
-        if progress_callback:
-            progress_callback("楽曲を解析中...", 50)
-            
-        rhythm_data = self.song_analyzer.analyze_song(song_path)
+    def download_and_analyze_song(self, youtube_url: str, progress_callback=None) -> str:
+        """YouTubeから楽曲をダウンロードして解析
+
+        進捗はダウンロードを0-50%、解析を50-100%として報告する。
+        """
+        def report(message: str, progress: int) -> None:
+            if progress_callback:
+                progress_callback(message, progress)
+
+        song_path = self.download_song(youtube_url, lambda message, progress: report(message, progress // 2))
+        
+        report("楽曲を解析中...", 50)
+        rhythm_data = self.song_analyzer.analyze_song(
+            song_path, lambda message, progress: report(message, 50 + progress // 2)
+        )
         self.song_library.add_song(song_path, rhythm_data)
         
-        if progress_callback:
-            progress_callback("完了", 100)
-            
+        report("完了", 100)
         return song_path
     
+    def analyze_and_add_song(self, song_path: str, progress_callback=None) -> str:
+        """ローカルの楽曲ファイルを解析してライブラリに登録"""
+        rhythm_data = self.song_analyzer.analyze_song(song_path, progress_callback)
+        self.song_library.add_song(song_path, rhythm_data)
+        return song_path
+    
+    def analyze_songs_dir(self, workers: Optional[int] = None, progress_callback=None) -> Dict[str, str]:
+        """楽曲フォルダ内の未登録曲を並列解析してライブラリに一括登録"""
+        from batch_analyzer import analyze_into_library
+        _, errors = analyze_into_library(self.song_library, workers, progress_callback)
+        return errors
+    
+    def scan_library(self) -> ScanResult:
+        """楽曲フォルダの差分をスキャン"""
+        return self.library_scanner.scan()
+    
     def start_game(self, song_path):
         print(f"GameManager: ゲーム開始処理 - {song_path}")
-        rhythm_data = self.song_library.get_rhythm_data(song_path)
+        rhythm_data = self.song_library.get_rhythm_data(song_path, self.difficulty, self.chart_params)
         print(f"GameManager: リズムデータ取得完了")
         self.game_runner.run(song_path, rhythm_data)
     def get_available_songs(self) -> list:
@@ -42,6 +105,16 @@ class GameManager:
         return self.song_library.get_song_details(song_path)
     
     def update_settings(self, settings: Dict) -> None:
-        """ゲーム設定を更新"""
-        self.game_runner.update_settings(settings)
+        """ゲーム設定を更新
+
+        難易度と譜面の設定（'chart'）は次に開始する曲の譜面の選択に使い、
+        それ以外はゲーム本体に渡す。
+        """
+        settings = dict(settings)
+        if 'difficulty' in settings:
+            self.difficulty = settings.pop('difficulty')
+        if 'chart' in settings:
+            self.chart_params = dict(settings.pop('chart') or {})
+        if settings:
+            self.game_runner.update_settings(settings)
 
@@ -1,7 +1,17 @@
 import pygame
 import os
-from typing import Dict, List, Optional
+import sys
+import bisect
+import numpy as np
+from typing import Dict, List, Optional, Tuple
 import random
+from concurrent.futures import Future, ThreadPoolExecutor
+from asset_cache import AssetCache
+from obstacle_pool import ObstaclePool
+from render_cache import RenderCache
+import frame_profiler
+from frame_profiler import FrameProfiler
+from config import GAME_LOOP_SETTINGS, RENDER_SETTINGS, PROFILER_SETTINGS, IMAGES_DIR
 
 class GameRunner:
     def __init__(self):
@@ -13,14 +23,31 @@ class GameRunner:
         self.base_height = 200
         self.setup_display()
         
-        # ゲーム設定
+        # ゲーム設定（速度は毎秒、重力は毎秒毎秒の単位。60fps時の旧設定と同じ動き）
         self.settings = {
-            'scroll_speed': 2 * self.scale_factor,
-            'jump_speed': -15,
-            'gravity': 1.35,
-            'obstacle_speed': 5 * self.scale_factor
+            'scroll_speed': 120 * self.scale_factor,
+            'jump_speed': -900,
+            'gravity': 4860,
+            'obstacle_speed': 300 * self.scale_factor
         }
         
+        # ゲームループ設定
+        self.fixed_dt = GAME_LOOP_SETTINGS['fixed_timestep']
+        self.frame_rate = GAME_LOOP_SETTINGS['frame_rate']
+        self.max_catchup = GAME_LOOP_SETTINGS['max_catchup']
+        
+        # Trueにすると衝突しても回数を数えるだけでゲームオーバーにしない（ベンチマーク用）
+        self.invincible = False
+        
+        # フェーズ別の処理時間計測（F3でオーバーレイ表示を切り替え）
+        self.profiler = FrameProfiler(
+            PROFILER_SETTINGS['capacity'], PROFILER_SETTINGS['enabled']
+        )
+        self.hud_interval = 500  # オーバーレイの更新間隔（ミリ秒）
+        self.hud_surfaces: List[pygame.Surface] = []
+        self.hud_updated = None
+        self.profiler_capacity: Optional[int] = None  # run()ごとにバッファを作り直す大きさ（Noneで設定値のまま）
+        
         # フェード設定
         self.fade_duration = 10000
         self.fade_start_time = 0
@@ -29,7 +56,16 @@ class GameRunner:
         self.bg_x1 = 0
         self.bg_x2 = self.width
         
-        # アセット読み込み
+        # 描画設定（差分矩形は背景が単色の場合のみ。アセットの読み込み完了時に決める）
+        self.background_color = (255, 255, 255)
+        self.use_dirty_rects = False
+        self.dirty_rects: List[pygame.Rect] = []
+        self.prev_dirty_rects: Optional[List[pygame.Rect]] = None
+        
+        # アセット読み込み（カウントダウン中にバックグラウンドで行う）
+        self.render_cache = RenderCache()
+        self.asset_cache = AssetCache()
+        self.asset_future: Optional[Future] = None
         self.load_assets()
         
         # ゲーム状態
@@ -38,10 +74,12 @@ class GameRunner:
     def setup_display(self) -> None:
         pygame.display.gl_set_attribute(pygame.GL_DOUBLEBUFFER, 1)
         os.environ['SDL_VIDEO_SYNCHRONIZED'] = '1'
-        info = pygame.display.Info()
+        # display.Info()は開いているウィンドウ（メニューの800x600）の大きさを返すので、
+        # 全画面の解像度はデスクトップの大きさから求める
+        desktop_w, desktop_h = pygame.display.get_desktop_sizes()[0]
         self.scale_factor = min(
-            info.current_w / self.base_width,
-            info.current_h / self.base_height
+            desktop_w / self.base_width,
+            desktop_h / self.base_height
         )
         self.width = int(self.base_width * self.scale_factor)
         self.height = int(self.base_height * self.scale_factor)
@@ -52,38 +90,70 @@ class GameRunner:
         pygame.display.set_caption("Rhythm Game")
 
     def load_assets(self) -> None:
-        self.images = {
-            'player': self.load_image('player.png', 
+        """アセットの読み込みをバックグラウンドで始める（完了までは画像なしで描画）"""
+        self.images = {'player': None, 'background': None, 'obstacles': []}
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.asset_future = executor.submit(self.read_assets)
+        executor.shutdown(wait=False)
+
+    def read_assets(self) -> Dict:
+        """拡大縮小済みの画像をキャッシュから読み込む（バックグラウンドスレッドで実行）"""
+        return {
+            'player': self.read_image('player.png',
                 (int(48 * self.scale_factor), int(64 * self.scale_factor))),
-            'background': self.load_image('background.png', 
-                (self.width, self.height)),
-            'obstacles': self.load_obstacle_images()
+            'background': self.read_image('background.png',
+                (self.width, self.height), alpha=False),
+            'obstacles': self.read_obstacle_atlas(
+                (int(28 * self.scale_factor), int(48 * self.scale_factor)))
         }
-        
-    def load_image(self, image_name: str, size: tuple) -> Optional[pygame.Surface]:
+
+    def read_image(self, image_name: str, size: tuple, alpha: bool = True) -> Optional[pygame.Surface]:
+        image_path = os.path.join(IMAGES_DIR, image_name)
         try:
-            image_path = os.path.join('assets', 'images', image_name)
-            return pygame.transform.scale(
-                pygame.image.load(image_path), size
-            )
+            return self.asset_cache.load_image(image_path, size, alpha)
         except Exception as e:
-            print(f"画像読み込みエラー: {image_path} - {str(e)}")
+            print(f"画像読み込みエラー: {image_path} - {str(e)}", file=sys.stderr)
             return None
 
-    def load_obstacle_images(self) -> List[pygame.Surface]:
-        obstacles_path = os.path.join('assets', 'images', 'obstacles')
-        images = []
-        if os.path.exists(obstacles_path):
-            for file in os.listdir(obstacles_path):
-                if file.lower().endswith('.png'):
-                    img = self.load_image(
-                        os.path.join('obstacles', file),
-                        (int(28 * self.scale_factor), 
-                         int(48 * self.scale_factor))
-                    )
-                    if img:
-                        images.append(img)
-        return images
+    def read_obstacle_atlas(self, size: tuple) -> Optional[Tuple[pygame.Surface, List[pygame.Rect]]]:
+        """障害物の画像を1枚のアトラスにまとめて読み込む"""
+        obstacles_path = os.path.join(IMAGES_DIR, 'obstacles')
+        if not os.path.exists(obstacles_path):
+            return None
+        paths = sorted(
+            os.path.join(obstacles_path, file)
+            for file in os.listdir(obstacles_path) if file.lower().endswith('.png')
+        )
+        if not paths:
+            return None
+        try:
+            return self.asset_cache.load_atlas(paths, size)
+        except Exception as e:
+            print(f"画像読み込みエラー: {obstacles_path} - {str(e)}", file=sys.stderr)
+            return None
+
+    def finish_loading_assets(self, wait: bool = False) -> bool:
+        """読み込みが終わっていれば画面のピクセル形式に変換して差し替え、完了したかを返す"""
+        if self.asset_future is None:
+            return True
+        if not wait and not self.asset_future.done():
+            return False
+        loaded = self.asset_future.result()
+        self.asset_future = None
+        
+        self.images = {
+            'player': loaded['player'].convert_alpha() if loaded['player'] else None,
+            'background': loaded['background'].convert() if loaded['background'] else None,
+            'obstacles': []
+        }
+        if loaded['obstacles']:
+            # 障害物はアトラスの部分サーフェスとして描画する
+            atlas, rects = loaded['obstacles']
+            atlas = atlas.convert_alpha()
+            self.images['obstacles'] = [atlas.subsurface(rect) for rect in rects]
+        self.use_dirty_rects = RENDER_SETTINGS['dirty_rects'] and not self.images['background']
+        self.prev_dirty_rects = None
+        return True
 
     def reset_game_state(self) -> None:
         self.player = {
@@ -91,82 +161,158 @@ class GameRunner:
             'y': self.height - int(64 * self.scale_factor) - int(10 * self.scale_factor),
             'velocity': 0
         }
-        self.obstacles = []
+        self.ground_y = self.player['y']
+        self.prev_player_y = self.player['y']
+        self.obstacle_size = (28 * self.scale_factor, 48 * self.scale_factor)
+        self.obstacle_y = self.height - int(48 * self.scale_factor) - int(10 * self.scale_factor)
+        self.player_hitbox = self.get_hitbox(48 * self.scale_factor, 64 * self.scale_factor)
+        self.obstacle_hitbox = self.get_hitbox(*self.obstacle_size)
+        self.obstacle_pool = ObstaclePool(1)
         self.score = 0
-        self.passed_obstacles = set()
+        self.passed_count = 0
+        self.collisions = 0
         self.game_over = False
         self.game_clear = False
         self.rhythm_index = 0
         self.bg_x1 = 0
         self.bg_x2 = self.width
         self.fade_start_time = 0
+        self.stop_time = None
+
+    def get_ticks(self) -> int:
+        """ゲーム内時計（ミリ秒）。ヘッドレス実行では仮想時計に差し替える"""
+        return pygame.time.get_ticks()
 
-    def run(self, song_path: str, rhythm_data: Dict) -> None:
+    def run(self, song_path: Optional[str], rhythm_data: Dict) -> None:
+        """譜面をプレイする（song_pathがNoneなら音楽なしで譜面だけ再生）"""
+        # メニューが画面モードを戻しているので毎回ゲーム用の画面に切り替える
+        # （set_modeは同じSurfaceオブジェクトを返すので、同一性では判定できない）
+        self.setup_display()
         self.reset_game_state()
+        self.jump_times = self.compile_spawn_schedule(rhythm_data['chart'])
+        self.obstacle_pool = ObstaclePool(self.get_pool_capacity())
         clock = pygame.time.Clock()
         
-        pygame.mixer.music.load(song_path)
-        start_time = pygame.time.get_ticks() + 3000
-        pygame.mixer.music.play(start=0, fade_ms=0)
-        pygame.mixer.music.pause()
+        if song_path:
+            pygame.mixer.music.load(song_path)
+            pygame.mixer.music.play(start=0, fade_ms=0)
+            pygame.mixer.music.pause()
+        start_time = self.get_ticks() + 3000
         
         game_ready = False
+        self.prev_dirty_rects = None
+        assets_ready = self.finish_loading_assets()
+        sim_time = -3.0  # シミュレーション済みの曲の時刻（秒）
+        profiler = self.profiler
+        profiler.reset(self.profiler_capacity)
         
         while True:
-            current_time = pygame.time.get_ticks()
+            profiler.begin_frame()
+            current_time = self.get_ticks()
+            song_time = (current_time - start_time) / 1000
             
             if self.handle_events():
-                pygame.mixer.music.stop()
+                if song_path:
+                    pygame.mixer.music.stop()
                 break
+            profiler.mark(frame_profiler.EVENTS)
             
-            # 背景スクロール
-            self.bg_x1 -= self.settings['scroll_speed']
-            self.bg_x2 -= self.settings['scroll_speed']
-            if self.bg_x1 <= -self.width:
-                self.bg_x1 = self.width
-            if self.bg_x2 <= -self.width:
-                self.bg_x2 = self.width
+            if not assets_ready:
+                # カウントダウン中に読み込みが終われば差し替え、終わらなければ開始時に待つ
+                assets_ready = self.finish_loading_assets(wait=current_time >= start_time)
             
-            # 背景描画
-            if self.images['background']:
-                self.screen.blit(self.images['background'], (self.bg_x1, 0))
-                self.screen.blit(self.images['background'], (self.bg_x2, 0))
-            else:
-                self.screen.fill((255, 255, 255))
+            if not game_ready and current_time >= start_time:
+                game_ready = True
+                if song_path:
+                    pygame.mixer.music.unpause()
             
-            # プレイヤーの物理演算
-            self.player['velocity'] += self.settings['gravity'] * self.scale_factor
-            self.player['y'] += self.player['velocity']
-            if self.player['y'] > self.height - int(64 * self.scale_factor) - int(10 * self.scale_factor):
-                self.player['y'] = self.height - int(64 * self.scale_factor) - int(10 * self.scale_factor)
-                self.player['velocity'] = 0
+            # 固定ステップでシミュレーションを曲の時刻まで進める
+            if song_time - sim_time > self.max_catchup:
+                sim_time = song_time - self.fixed_dt
+            while sim_time + self.fixed_dt <= song_time:
+                sim_time += self.fixed_dt
+                self.step(self.fixed_dt)
+                profiler.mark(frame_profiler.PHYSICS)
+                if sim_time >= 0:
+                    self.update_game_state(sim_time, rhythm_data)
             
-            # プレイヤー描画
-            if self.images['player']:
-                self.screen.blit(
-                    self.images['player'],
-                    (self.player['x'], self.player['y'])
-                )
+            # 描画（プレイヤーはステップ間を補間し、障害物は曲の時刻から位置を求める）
+            alpha = (song_time - sim_time) / self.fixed_dt
+            self.draw_background()
+            self.draw_player(alpha)
             
             if not game_ready:
-                if current_time >= start_time:
-                    game_ready = True
-                    pygame.mixer.music.unpause()
-                else:
-                    countdown = str(3 - (current_time - (start_time - 3000)) // 1000)
-                    self.draw_countdown(countdown)
+                countdown = str(3 - (current_time - (start_time - 3000)) // 1000)
+                self.draw_countdown(countdown)
             else:
-                self.update_game_state((current_time - start_time) / 1000, rhythm_data)
-                self.draw()
+                self.draw(song_time)
                 
-                if self.game_clear:
-                    current_fade_time = pygame.time.get_ticks() - self.fade_start_time
+                if self.game_clear and song_path:
+                    current_fade_time = self.get_ticks() - self.fade_start_time
                     if current_fade_time <= self.fade_duration:
                         volume = 1.0 - (current_fade_time / self.fade_duration)
                         pygame.mixer.music.set_volume(volume)
             
+            if profiler.enabled:
+                self.draw_hud()
+            profiler.mark(frame_profiler.DRAW)
+            self.present()
+            profiler.mark(frame_profiler.PRESENT)
+            clock.tick(self.frame_rate)
+            profiler.mark(frame_profiler.WAIT)
+        
+        if PROFILER_SETTINGS['dump_path'] and profiler.count:
+            profiler.dump(PROFILER_SETTINGS['dump_path'])
+
+    def step(self, dt: float) -> None:
+        """プレイヤーの物理演算と背景スクロールをdt秒進める"""
+        # 背景スクロール
+        self.bg_x1 -= self.settings['scroll_speed'] * dt
+        self.bg_x2 -= self.settings['scroll_speed'] * dt
+        if self.bg_x1 <= -self.width:
+            self.bg_x1 += self.width * 2
+        if self.bg_x2 <= -self.width:
+            self.bg_x2 += self.width * 2
+        
+        # プレイヤーの物理演算（等加速度運動として積分するのでステップ幅に依存しない）
+        self.prev_player_y = self.player['y']
+        gravity = self.settings['gravity'] * self.scale_factor
+        self.player['y'] += self.player['velocity'] * dt + 0.5 * gravity * dt * dt
+        self.player['velocity'] += gravity * dt
+        if self.player['y'] > self.ground_y:
+            self.player['y'] = self.ground_y
+            self.player['velocity'] = 0
+
+    def blit(self, surface: pygame.Surface, pos) -> pygame.Rect:
+        """画面に描画し、差分更新用に描画範囲を記録"""
+        rect = self.screen.blit(surface, pos)
+        self.dirty_rects.append(rect)
+        return rect
+
+    def present(self) -> None:
+        """描画結果を画面に反映（差分更新時は前フレームと今フレームの描画範囲のみ）"""
+        if self.use_dirty_rects and self.prev_dirty_rects is not None:
+            pygame.display.update(self.prev_dirty_rects + self.dirty_rects)
+        else:
             pygame.display.flip()
-            clock.tick(60)
+        self.prev_dirty_rects = self.dirty_rects
+        self.dirty_rects = []
+
+    def draw_background(self) -> None:
+        if self.images['background']:
+            self.screen.blit(self.images['background'], (self.bg_x1, 0))
+            self.screen.blit(self.images['background'], (self.bg_x2, 0))
+        elif self.use_dirty_rects and self.prev_dirty_rects is not None:
+            # 前フレームで描画した部分だけ背景色で消す
+            for rect in self.prev_dirty_rects:
+                self.screen.fill(self.background_color, rect)
+        else:
+            self.screen.fill(self.background_color)
+
+    def draw_player(self, alpha: float) -> None:
+        if self.images['player']:
+            y = self.prev_player_y + (self.player['y'] - self.prev_player_y) * alpha
+            self.blit(self.images['player'], (self.player['x'], y))
 
     def handle_events(self) -> bool:
         for event in pygame.event.get():
@@ -177,8 +323,11 @@ class GameRunner:
                 return True
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    if self.player['y'] >= self.height - int(64 * self.scale_factor) - int(10 * self.scale_factor):
+                    if self.player['y'] >= self.ground_y:
                         self.player['velocity'] = self.settings['jump_speed'] * self.scale_factor
+                elif event.key == pygame.K_F3:
+                    self.profiler.toggle()
+                    self.hud_updated = None
         return False
 
     def update_game_state(self, current_time: float, rhythm_data: Dict) -> None:
@@ -187,86 +336,124 @@ class GameRunner:
             
         # 障害物の更新
         self.update_obstacles(current_time, rhythm_data)
+        self.profiler.mark(frame_profiler.OBSTACLES)
         
         # 衝突判定
         self.check_collisions()
+        
+        # 画面外に出た障害物のスロットを解放
+        self.obstacle_pool.release_before(-self.obstacle_size[0])
+        self.profiler.mark(frame_profiler.COLLISIONS)
 
         # クリア判定
-        if (self.rhythm_index >= len(rhythm_data['rhythm_patterns']) and 
-            len(self.passed_obstacles) == len(rhythm_data['rhythm_patterns'])):
+        if (self.rhythm_index >= len(self.jump_times) and 
+            self.passed_count == len(self.jump_times)):
             self.game_clear = True
-            self.fade_start_time = pygame.time.get_ticks()
+            self.fade_start_time = self.get_ticks()
+        
+        if self.game_over or self.game_clear:
+            self.stop_time = current_time
+
+    def compile_spawn_schedule(self, chart: np.ndarray) -> List[float]:
+        """譜面から障害物の出現時刻を昇順に並べた出現スケジュールを作る"""
+        # 譜面の並び順には依存せず、以降はカーソルと二分探索だけで参照する
+        return np.sort(np.asarray(chart['jump_time'], dtype=float)).tolist()
+
+    def get_pool_capacity(self) -> int:
+        """画面内に同時に存在しうる障害物の最大数を譜面から求める"""
+        if len(self.jump_times) == 0:
+            return 1
+        times = np.asarray(self.jump_times)
+        lifetime = (self.width + self.obstacle_size[0]) / self.settings['obstacle_speed']
+        on_screen = np.searchsorted(times, times + lifetime, side='right') - np.arange(len(times))
+        # 解放はステップ単位で行うので少し余裕を持たせる
+        return int(on_screen.max()) + 2
+
+    def obstacle_x(self, spawn_time: float, current_time: float) -> float:
+        """出現時刻と曲の時刻から障害物のx座標を求める"""
+        return self.width - (current_time - spawn_time) * self.settings['obstacle_speed']
 
     def update_obstacles(self, current_time: float, rhythm_data: Dict) -> None:
+        pool = self.obstacle_pool
+        
         # 既存の障害物を移動
-        for obstacle in self.obstacles:
-            obstacle['x'] -= self.settings['obstacle_speed']
-            
-        # 新しい障害物の生成
-        if (self.rhythm_index < len(rhythm_data['rhythm_patterns']) and 
-            current_time >= rhythm_data['rhythm_patterns'][self.rhythm_index]['jump_time']):
+        for slot in pool.slots():
+            pool.x[slot] = self.obstacle_x(pool.spawn_time[slot], current_time)
             
-            self.obstacles.append({
-                'x': self.width,
-                'y': self.height - int(48 * self.scale_factor) - int(10 * self.scale_factor),
-                'image': random.choice(self.images['obstacles']) 
-                    if self.images['obstacles'] else None
-            })
-            self.rhythm_index += 1
+        # 出現時刻を過ぎた障害物をまとめて生成（処理落ちしても遅れた分だけ進んだ位置に置く）
+        due = bisect.bisect_right(self.jump_times, current_time, self.rhythm_index)
+        for spawn_time in self.jump_times[self.rhythm_index:due]:
+            if pool.full() and not pool.drop_oldest():
+                self.passed_count += 1
+            pool.spawn(
+                spawn_time,
+                self.obstacle_x(spawn_time, current_time),
+                self.obstacle_y,
+                random.choice(self.images['obstacles']) if self.images['obstacles'] else None
+            )
+        self.rhythm_index = due
 
     def check_collisions(self) -> None:
-        player_rect = self.get_collision_rect(
-            pygame.Rect(
-                self.player['x'], 
-                self.player['y'],
-                48 * self.scale_factor,
-                64 * self.scale_factor
-            )
-        )
+        pool = self.obstacle_pool
+        player_x = self.player['x']
+        dx, dy, width, height = self.player_hitbox
+        player_left = player_x + dx
+        player_right = player_left + width
+        player_top = self.player['y'] + dy
+        player_bottom = player_top + height
+        odx, ody, obstacle_width, obstacle_height = self.obstacle_hitbox
         
-        for i, obstacle in enumerate(self.obstacles):
-            obstacle_rect = self.get_collision_rect(
-                pygame.Rect(
-                    obstacle['x'],
-                    obstacle['y'],
-                    28 * self.scale_factor,
-                    48 * self.scale_factor
-                )
-            )
+        # 障害物は左から順に並んでいるので、プレイヤーより右に出たら打ち切る
+        for slot in pool.slots():
+            x = pool.x[slot]
+            obstacle_left = x + odx
+            if obstacle_left >= player_right:
+                break
             
-            if player_rect.colliderect(obstacle_rect):
-                self.game_over = True
-                return
+            if obstacle_left + obstacle_width > player_left:
+                obstacle_top = pool.y[slot] + ody
+                if obstacle_top < player_bottom and obstacle_top + obstacle_height > player_top:
+                    if not pool.hit[slot]:
+                        pool.hit[slot] = True
+                        self.collisions += 1
+                    if not self.invincible:
+                        self.game_over = True
+                        return
                 
-            if i not in self.passed_obstacles and obstacle['x'] < self.player['x']:
+            if not pool.passed[slot] and x < player_x:
                 self.score += 1
-                self.passed_obstacles.add(i)
+                self.passed_count += 1
+                pool.passed[slot] = True
 
-    def get_collision_rect(self, visual_rect: pygame.Rect) -> pygame.Rect:
+    def get_hitbox(self, width: float, height: float) -> Tuple[float, float, float, float]:
+        """見た目の矩形に対する当たり判定の (xオフセット, yオフセット, 幅, 高さ)"""
         reduction = 0.25
-        width_reduction = visual_rect.width * reduction
-        height_reduction = visual_rect.height * reduction
-        
-        return pygame.Rect(
-            visual_rect.x + width_reduction,
-            visual_rect.y + height_reduction,
-            visual_rect.width - (width_reduction * 2),
-            visual_rect.height - (height_reduction * 2)
+        width_reduction = width * reduction
+        height_reduction = height * reduction
+        return (
+            width_reduction,
+            height_reduction,
+            width - (width_reduction * 2),
+            height - (height_reduction * 2)
         )
 
-    def draw(self) -> None:
-        # 障害物描画
-        for obstacle in self.obstacles:
-            if obstacle['image']:
-                self.screen.blit(
-                    obstacle['image'],
-                    (obstacle['x'], obstacle['y'])
+    def draw(self, current_time: float) -> None:
+        # 障害物描画（ゲーム終了後は終了時点の位置で止める）
+        if self.stop_time is not None:
+            current_time = self.stop_time
+        pool = self.obstacle_pool
+        for slot in pool.slots():
+            if pool.sprite[slot]:
+                self.blit(
+                    pool.sprite[slot],
+                    (self.obstacle_x(pool.spawn_time[slot], current_time), pool.y[slot])
                 )
             
         # スコア表示
-        font = pygame.font.Font(None, int(36 * self.scale_factor))
-        score_text = font.render(f"Score: {self.score}", True, (255, 255, 255))
-        self.screen.blit(score_text, (self.width * 0.02, self.height * 0.02))
+        self.dirty_rects.append(self.render_cache.blit_number(
+            self.screen, "Score: ", self.score,
+            (self.width * 0.02, self.height * 0.02), int(36 * self.scale_factor)
+        ))
         
         # ゲームオーバー表示
         if self.game_over:
@@ -276,23 +463,34 @@ class GameRunner:
         if self.game_clear:
             self.draw_game_clear()
 
+    def draw_hud(self) -> None:
+        """FPS・p99フレーム時間・フェーズ別処理時間を左下に表示"""
+        now = self.get_ticks()
+        if self.hud_updated is None or now - self.hud_updated >= self.hud_interval:
+            # 毎フレーム描画し直すと計測対象を重くするので一定間隔で更新する
+            font = self.render_cache.font(max(10, int(10 * self.scale_factor)))
+            self.hud_surfaces = [
+                font.render(line, True, (255, 255, 0), (0, 0, 0))
+                for line in self.profiler.hud_lines()
+            ]
+            self.hud_updated = now
+        y = self.height
+        for surface in reversed(self.hud_surfaces):
+            y -= surface.get_height()
+            self.blit(surface, (self.width * 0.02, y))
+
+    def draw_centered_text(self, text: str) -> None:
+        surface = self.render_cache.text(text, int(72 * self.scale_factor))
+        self.blit(surface, surface.get_rect(center=(self.width // 2, self.height // 2)))
+
     def draw_countdown(self, countdown: str) -> None:
-        font = pygame.font.Font(None, int(72 * self.scale_factor))
-        text = font.render(countdown, True, (255, 255, 255))
-        text_rect = text.get_rect(center=(self.width // 2, self.height // 2))
-        self.screen.blit(text, text_rect)
+        self.draw_centered_text(countdown)
 
     def draw_game_over(self) -> None:
-        font = pygame.font.Font(None, int(72 * self.scale_factor))
-        text = font.render("Game Over", True, (255, 255, 255))
-        text_rect = text.get_rect(center=(self.width // 2, self.height // 2))
-        self.screen.blit(text, text_rect)
+        self.draw_centered_text("Game Over")
 
     def draw_game_clear(self) -> None:
-        font = pygame.font.Font(None, int(72 * self.scale_factor))
-        text = font.render("CLEAR!", True, (255, 255, 255))
-        text_rect = text.get_rect(center=(self.width // 2, self.height // 2))
-        self.screen.blit(text, text_rect)
+        self.draw_centered_text("CLEAR!")
 
     def update_settings(self, settings: Dict) -> None:
         self.settings.update(settings)
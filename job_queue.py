@@ -0,0 +1,219 @@
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from config import JOB_QUEUE_WORKERS, DOWNLOAD_WORKERS
+
+class JobCancelled(Exception):
+    """ジョブがキャンセルされたことを示す例外"""
+
+@dataclass
+class Job:
+    id: int
+    source: str             # ダウンロードならURL、解析のみならファイルパス
+    kind: str = "download"  # download / analyze
+    status: str = "queued"  # queued / running / done / failed / cancelled / interrupted
+    message: str = "待機中"
+    progress: int = 0
+    song_path: Optional[str] = None
+    error: Optional[str] = None
+    key: Optional[str] = None       # ダウンロードアーカイブのキー（"youtube <動画ID>"）
+    batch_id: Optional[str] = None  # 一括取り込みのID
+    # キャンセル時の状態（利用者のキャンセルはcancelled、終了による中断はinterrupted）
+    cancel_status: str = "cancelled"
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled", "interrupted")
+
+class JobQueue:
+    """ダウンロードと解析をワーカースレッドで実行するジョブキュー
+
+    ダウンロードはdownload_workers本のスレッドで並行して行い、終わったものから
+    解析用のキューに渡す（解析はnum_workers本）。ジョブの状態はワーカースレッドが
+    書き換え、メインループは get_jobs / poll_finished で読み取るだけにする。
+    """
+
+    def __init__(self, game_manager, num_workers: int = JOB_QUEUE_WORKERS,
+                 download_workers: int = DOWNLOAD_WORKERS):
+        self.game_manager = game_manager
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._download_queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._finished: "queue.Queue[Job]" = queue.Queue()
+        self._listeners: List[Callable[[Job], None]] = []
+        self._jobs: Dict[int, Job] = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        self._download_workers = [
+            threading.Thread(target=self._download_worker, name=f"download-worker-{i}", daemon=True)
+            for i in range(download_workers)
+        ]
+        for worker in self._workers + self._download_workers:
+            worker.start()
+
+    def add_listener(self, listener: Callable[[Job], None]) -> None:
+        """ジョブ終了時にワーカースレッドから呼ばれる関数を登録"""
+        self._listeners.append(listener)
+
+    def submit(self, url: str, key: Optional[str] = None, batch_id: Optional[str] = None) -> Job:
+        """URLのダウンロード・解析ジョブを追加"""
+        return self._enqueue(url, "download", key, batch_id)
+
+    def submit_file(self, file_path: str) -> Job:
+        """ローカルファイルの解析ジョブを追加"""
+        return self._enqueue(file_path, "analyze")
+
+    def _enqueue(self, source: str, kind: str, key: Optional[str] = None,
+                 batch_id: Optional[str] = None) -> Job:
+        with self._lock:
+            for job in self._jobs.values():
+                if job.source == source and job.kind == kind and not job.finished:
+                    return job
+            job = Job(self._next_id, source, kind, key=key, batch_id=batch_id)
+            self._jobs[job.id] = job
+            self._next_id += 1
+        if kind == "download":
+            self._download_queue.put(job)
+        else:
+            self._queue.put(job)
+        return job
+
+    def cancel(self, job_id: int, status: str = "cancelled") -> bool:
+        """ジョブをキャンセル（実行中のジョブは次の進捗報告で中断する）
+
+        statusは終了後の状態。終了による中断は"interrupted"にして、一括取り込みの
+        再開時に利用者がキャンセルしたジョブと区別できるようにする。
+        """
+        # 待機中→キャンセルの遷移はワーカーの待機中→実行中の遷移と同じロックで行い、
+        # どちらか一方だけが起きるようにする
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            # 先に利用者がキャンセルしたジョブは、終了時に中断扱いへ上書きしない
+            if not job.cancel_event.is_set():
+                job.cancel_status = status
+            job.cancel_event.set()
+            cancelled = job.status == "queued"
+            if cancelled:
+                job.status = status
+                job.message = "キャンセルしました"
+        if cancelled:
+            self._finish(job)
+        return True
+
+    def pending_count(self) -> int:
+        """終了していないジョブの数"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def get_jobs(self) -> List[Job]:
+        """登録順のジョブ一覧を返す"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def poll_finished(self) -> List[Job]:
+        """前回の呼び出し以降に終了したジョブを返す"""
+        finished = []
+        while True:
+            try:
+                finished.append(self._finished.get_nowait())
+            except queue.Empty:
+                return finished
+
+    def clear_finished(self) -> None:
+        """終了済みのジョブを一覧から取り除く"""
+        with self._lock:
+            self._jobs = {job_id: job for job_id, job in self._jobs.items() if not job.finished}
+
+    def shutdown(self) -> None:
+        """待機中のジョブを中断してワーカーを停止"""
+        for job in self.get_jobs():
+            self.cancel(job.id, "interrupted")
+        for _ in self._workers:
+            self._queue.put(None)
+        for _ in self._download_workers:
+            self._download_queue.put(None)
+
+    def _download_worker(self) -> None:
+        """ダウンロードだけを行い、保存したファイルを解析キューに渡す"""
+        while True:
+            job = self._download_queue.get()
+            if job is None:
+                return
+            if not self._start(job):
+                continue
+            try:
+                # 進捗はダウンロードを0-50%、解析を50-100%として表示する
+                job.song_path = self.game_manager.download_song(
+                    job.source, lambda msg, progress: self._report(job, msg, progress // 2)
+                )
+            except Exception as e:
+                self._fail(job, e)
+                continue
+            job.message = "解析待ち"
+            job.progress = 50
+            self._queue.put(job)
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if not self._start(job):
+                # ダウンロード後に解析待ちでキャンセルされたジョブはここで終了させる
+                if not job.finished:
+                    self._fail(job, JobCancelled())
+                continue
+            offset = 50 if job.kind == "download" else 0
+            try:
+                job.song_path = self.game_manager.analyze_and_add_song(
+                    job.song_path or job.source,
+                    lambda msg, progress: self._report(job, msg, offset + progress * (100 - offset) // 100)
+                )
+            except Exception as e:
+                self._fail(job, e)
+                continue
+            with self._lock:
+                job.status = "done"
+                job.message = "完了"
+                job.progress = 100
+            self._finish(job)
+
+    def _start(self, job: Job) -> bool:
+        """ジョブを実行中にする（キャンセル・終了済みならFalse）"""
+        with self._lock:
+            if job.finished or job.cancel_event.is_set():
+                return False
+            job.status = "running"
+            return True
+
+    def _fail(self, job: Job, error: Exception) -> None:
+        with self._lock:
+            if job.cancel_event.is_set():
+                job.status = job.cancel_status
+                job.message = "キャンセルしました"
+            else:
+                job.status = "failed"
+                job.error = str(error)
+                job.message = "エラーが発生しました"
+        self._finish(job)
+
+    def _finish(self, job: Job) -> None:
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                print(f"ジョブ終了処理のエラー: {e}")
+        self._finished.put(job)
+
+    def _report(self, job: Job, message: str, progress: int) -> None:
+        if job.cancel_event.is_set():
+            raise JobCancelled()
+        job.message = message
+        job.progress = progress
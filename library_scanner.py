@@ -0,0 +1,101 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from utils import file_digest
+from config import AUDIO_EXTENSIONS
+
+@dataclass
+class ScanResult:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    touched: List[str] = field(default_factory=list)  # 更新時刻だけ変わり内容は同じファイル
+    pending: List[str] = field(default_factory=list)  # 解析待ちのファイル
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+class LibraryScanner:
+    """楽曲フォルダを差分スキャンし、新規・変更ファイルを検出する
+
+    (パス, サイズ, 更新時刻, ダイジェスト) をライブラリのDBに記録しておき、
+    サイズか更新時刻が変わったファイルだけダイジェストを計算し直す。ダイジェストが
+    記録と同じなら（touchやrsyncで更新時刻だけ変わった場合）変更として扱わない。
+    ダイジェストの計算は大量のファイルを読むので、メインスレッドから呼ばないこと。
+    """
+
+    def __init__(self, song_library):
+        self.song_library = song_library
+        self.songs_dir = song_library.songs_dir
+        with song_library._lock, song_library.conn:
+            song_library.conn.execute(
+                """CREATE TABLE IF NOT EXISTS scan_index (
+                       path TEXT PRIMARY KEY,
+                       size INTEGER NOT NULL,
+                       mtime_ns INTEGER NOT NULL,
+                       digest TEXT NOT NULL
+                   )"""
+            )
+
+    def _walk(self) -> Dict[str, Tuple[int, int]]:
+        """楽曲フォルダ内の音声ファイルの (サイズ, 更新時刻) を集める"""
+        files = {}
+        stack = [self.songs_dir]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def scan(self) -> ScanResult:
+        """前回のスキャンからの差分を検出し、インデックスとライブラリを更新"""
+        library = self.song_library
+        current = self._walk()
+        with library._lock:
+            index = {
+                row['path']: (row['size'], row['mtime_ns'], row['digest'])
+                for row in library.conn.execute("SELECT path, size, mtime_ns, digest FROM scan_index")
+            }
+
+        result = ScanResult()
+        rows = []
+        for path, stat in current.items():
+            if path not in index:
+                result.added.append(path)
+                rows.append((path, *stat, file_digest(path)))
+            elif index[path][:2] != stat:
+                digest = file_digest(path)
+                if digest == index[path][2]:
+                    result.touched.append(path)
+                else:
+                    result.changed.append(path)
+                rows.append((path, *stat, digest))
+        result.removed = [path for path in index if path not in current]
+
+        if rows or result.removed:
+            with library._lock, library.conn:
+                library.conn.executemany(
+                    "INSERT OR REPLACE INTO scan_index (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                library.conn.executemany(
+                    "DELETE FROM scan_index WHERE path = ?", [(path,) for path in result.removed]
+                )
+            library.remove_songs(result.removed)
+
+        # 内容が変わったファイルと、まだライブラリに登録されていないファイルを解析対象にする
+        registered = set(library.get_song_list())
+        result.pending = sorted(
+            path for path in current
+            if path not in registered or path in result.changed
+        )
+        return result
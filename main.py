@@ -1,4 +1,6 @@
-from menu_system import MenuSystem
+import startup  # 起動時間の計測を始めるため最初に読み込む
+import argparse
+import time
 from config import SONGS_DIR, CACHE_DIR, ASSETS_DIR
 from utils import ensure_dir_exists
 
@@ -7,12 +9,93 @@ def initialize_directories():
     for directory in [SONGS_DIR, CACHE_DIR, ASSETS_DIR]:
         ensure_dir_exists(directory)
 
+def analyze_all(workers=None):
+    """楽曲フォルダ内の曲をまとめて解析してライブラリに登録"""
+    from batch_analyzer import analyze_into_library
+    from song_analyzer import SongAnalyzer
+    from song_library import SongLibrary
+    analyzer = SongAnalyzer()
+    results, errors = analyze_into_library(
+        SongLibrary(), workers,
+        lambda msg, progress: print(f"{msg} - {progress}%完了"),
+        analyzer
+    )
+    print(f"{len(results)}曲を登録しました")
+    for song_path, error in errors.items():
+        print(f"解析エラー: {song_path} - {error}")
+    print(format_cache_stats(analyzer.get_cache_stats()))
+
+def format_cache_stats(stats):
+    """解析キャッシュの統計を1行にまとめる"""
+    return (f"解析キャッシュ: ヒット {stats['hits']} / ミス {stats['misses']}"
+            f"（ヒット率 {stats['hit_rate']:.0%}）、{stats['entries']}件 "
+            f"{stats['bytes'] / (1024 * 1024):.1f}MB、追い出し {stats['evictions']}件")
+
+def bulk_import(urls, url_file=None, resume=False, download_workers=None):
+    """プレイリスト・チャンネル・URLリストを一括で取り込み、終わるまで進捗を表示"""
+    from bulk_import import BulkImporter, read_url_list
+    from game_manager import GameManager
+    from job_queue import JobQueue
+    from config import DOWNLOAD_WORKERS
+    sources = list(urls) + (read_url_list(url_file) if url_file else [])
+    job_queue = JobQueue(GameManager(), download_workers=download_workers or DOWNLOAD_WORKERS)
+    importer = BulkImporter(job_queue)
+    try:
+        batches = importer.resume() if resume else []
+        for batch in batches:
+            print(f"中断した取り込みを再開します: {batch.id}（残り{len(batch.pending_items())}件）")
+        if sources:
+            print("URLを展開中...")
+            batches.append(importer.start(sources))
+        for batch in batches:
+            counts = batch.counts()
+            print(f"{batch.id}: {len(batch.items)}件中 {counts.get('queued', 0)}件を取り込み、"
+                  f"登録済み{counts.get('skipped', 0)}件を除外")
+        
+        finished = 0
+        while job_queue.pending_count():
+            time.sleep(0.5)
+            for job in job_queue.poll_finished():
+                finished += 1
+                detail = f" - {job.error}" if job.error else ""
+                print(f"[{finished}] {job.status}: {job.song_path or job.source}{detail}")
+    except KeyboardInterrupt:
+        # 進行状況はファイルに残っているので--resume-importで続きから再開できる
+        print("中断しました（--resume-importで再開できます）")
+    finally:
+        job_queue.shutdown()
+
 def main():
     """ゲームのメインエントリーポイント"""
+    parser = argparse.ArgumentParser(description="リズムゲーム")
+    parser.add_argument("--analyze-all", action="store_true",
+                        help="楽曲フォルダ内の未登録曲をすべて解析して終了")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="一括解析に使うプロセス数（省略時はCPUコア数）")
+    parser.add_argument("--import", dest="import_urls", nargs="+", default=[], metavar="URL",
+                        help="動画・プレイリスト・チャンネルのURLを一括で取り込んで終了")
+    parser.add_argument("--import-file", default=None,
+                        help="1行1URLのリストファイルから一括で取り込んで終了")
+    parser.add_argument("--resume-import", action="store_true",
+                        help="中断した一括取り込みを再開して終了")
+    parser.add_argument("--download-workers", type=int, default=None,
+                        help="一括取り込みの同時ダウンロード数")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="起動の各段階にかかった時間を表示")
+    args = parser.parse_args()
+
     initialize_directories()
-    menu = MenuSystem()
+    if args.analyze_all:
+        analyze_all(args.workers)
+        return
+    if args.import_urls or args.import_file or args.resume_import:
+        bulk_import(args.import_urls, args.import_file, args.resume_import, args.download_workers)
+        return
+
+    from menu_system import MenuSystem
+    startup.mark("モジュール読み込み")
+    menu = MenuSystem(startup_report=args.startup_report)
     menu.run()
 
 if __name__ == "__main__":
     main()
-
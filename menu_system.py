@@ -1,51 +1,192 @@
+import queue
+import threading
+import time
 import pygame
+import startup
+from typing import List
 from screens import TitleScreen, SongSelectScreen, DownloadScreen, OptionsScreen, MenuAction
 from game_manager import GameManager
+from job_queue import JobQueue
+from bulk_import import BulkImporter
+from config import MENU_SETTINGS, STARTUP_SETTINGS, BULK_IMPORT_SETTINGS
+
+# 画面の再描画が必要になるウィンドウイベント
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED)
 
 class MenuSystem:
-    def __init__(self):
+    def __init__(self, startup_report: bool = False):
         pygame.init()
         pygame.scrap.init()  # クリップボード機能の初期化
+        self.setup_display()
+        startup.mark("画面初期化")
         self.game_manager = GameManager()
-        self.screen = pygame.display.set_mode((800, 600))
-        pygame.display.set_caption("リズムゲーム")
+        self.job_queue = JobQueue(self.game_manager)
+        self.bulk_importer = BulkImporter(self.job_queue)
+        startup.mark("ライブラリ読み込み")
+        self.startup_report = startup_report
         
         self.screens = {
             'title': TitleScreen(),
             'song_select': SongSelectScreen(self.game_manager.song_library),
-            'download': DownloadScreen(),
+            'download': DownloadScreen(self.job_queue),
             'options': OptionsScreen()
         }
         self.current_screen = 'title'
+        self.frame_rate = MENU_SETTINGS['frame_rate']
+        self.poll_interval_ms = MENU_SETTINGS['poll_interval_ms']
+        self.report_cpu_interval = MENU_SETTINGS['report_cpu_interval']
+        self.cpu_sample = (time.perf_counter(), time.process_time())
+        self.scan_thread = None
+        self.scan_results: "queue.Queue" = queue.Queue()
+        
+    def setup_display(self):
+        self.screen = pygame.display.set_mode((800, 600))
+        pygame.display.set_caption("リズムゲーム")
         
     def run(self):
+        clock = pygame.time.Clock()
+        last_report = time.perf_counter()
+        self.screens[self.current_screen].render(self.screen)
+        pygame.display.flip()
+        self.on_first_frame()
         while True:
-            action = self.screens[self.current_screen].update(self.screen)
+            events = self.wait_events()
+            screen = self.screens[self.current_screen]
+            if any(event.type in EXPOSE_EVENTS for event in events):
+                screen.invalidate()
+            action = screen.handle_events(events)
             if action:
                 self.handle_action(action)
-            pygame.display.flip()
+            self.handle_finished_jobs()
+            self.handle_scan_results()
+            
+            # 状態が変わった画面だけ描画し直す
+            if self.screens[self.current_screen].render(self.screen):
+                pygame.display.flip()
+                clock.tick(self.frame_rate)
+            
+            if self.report_cpu_interval and time.perf_counter() - last_report >= self.report_cpu_interval:
+                print(f"メニューCPU使用率: {self.cpu_usage():.1%}")
+                last_report = time.perf_counter()
+    
+    def on_first_frame(self):
+        """タイトル画面を表示してから、起動時に後回しにした処理を行う"""
+        first_frame_ms = startup.mark("タイトル画面表示")
+        if self.startup_report or first_frame_ms > STARTUP_SETTINGS['first_frame_target_ms']:
+            print(f"起動時間（目標 {STARTUP_SETTINGS['first_frame_target_ms']}ms）:")
+            for line in startup.report():
+                print(f"  {line}")
+        
+        self.scan_library()
+        if BULK_IMPORT_SETTINGS['resume_on_start']:
+            resumed = self.bulk_importer.resume()
+            if resumed:
+                self.screens['download'].message = f"中断した取り込みを再開しました（{len(resumed)}件）"
+        if STARTUP_SETTINGS['warm_up']:
+            threading.Thread(target=self.warm_up, daemon=True).start()
+    
+    def warm_up(self):
+        """解析器の生成やJITコンパイルをバックグラウンドで済ませる"""
+        try:
+            self.game_manager.warm_up()
+        except Exception as e:
+            print(f"事前準備エラー: {e}")
+            return
+        ms = startup.mark("バックグラウンド準備完了")
+        if self.startup_report:
+            print(f"  バックグラウンド準備完了: {ms:.0f}ms")
+    
+    def wait_events(self) -> List[pygame.event.Event]:
+        """入力があるかpoll_interval_msが経過するまで待ち、溜まったイベントを返す"""
+        event = pygame.event.wait(self.poll_interval_ms)
+        if event.type == pygame.NOEVENT:
+            return []
+        events = [event] + pygame.event.get()
+        if any(event.type == pygame.QUIT for event in events):
+            self.handle_action(MenuAction("QUIT"))
+        return events
+    
+    def cpu_usage(self) -> float:
+        """前回の呼び出しからのプロセスのCPU使用率（1.0で1コア分）"""
+        wall, cpu = time.perf_counter(), time.process_time()
+        prev_wall, prev_cpu = self.cpu_sample
+        self.cpu_sample = (wall, cpu)
+        return (cpu - prev_cpu) / max(wall - prev_wall, 1e-9)
     
     def handle_action(self, action: MenuAction):
         if action.type == "QUIT":
+            self.job_queue.shutdown()
             pygame.quit()
             exit()
         elif action.type == "CHANGE_SCREEN":
             self.current_screen = action.screen
+            self.screens[self.current_screen].invalidate()
         elif action.type == "START_GAME":
             try:
                 self.game_manager.start_game(action.song_path)
             except Exception as e:
                 print(f"ゲーム開始エラー: {str(e)}")
+            # ゲームが画面モードを切り替えるのでメニューの画面に戻して描き直す
+            self.setup_display()
+            self.screens[self.current_screen].invalidate()
+        elif action.type == "UPDATE_SETTINGS":
+            self.game_manager.update_settings(action.settings)
+        elif action.type == "RESCAN":
+            self.scan_library()
         elif action.type == "DOWNLOAD":
-            try:
-                print("ダウンロードを開始します...")
-                self.game_manager.download_and_analyze_song(
-                    action.url,
-                    lambda msg, progress: print(f"{msg} - {progress}%完了")
-                )
-                print("ダウンロード完了")
+            # プレイリストやチャンネルの展開は通信するのでバックグラウンドで行う
+            self.screens['download'].message = "URLを確認中..."
+            self.bulk_importer.start_async(action.url.split(), self.on_import_started)
+        elif action.type == "CANCEL_JOB":
+            if self.job_queue.cancel(action.job_id):
+                self.screens['download'].message = "キャンセルしました"
+    
+    def on_import_started(self, batch, error):
+        """URLの展開が終わったときにバックグラウンドスレッドから呼ばれる"""
+        if error:
+            print(f"URL展開エラー: {error}")
+            self.screens['download'].message = "URLを取得できませんでした"
+            return
+        counts = batch.counts()
+        message = f"{counts.get('queued', 0)}曲のダウンロードを予約しました"
+        if counts.get('skipped'):
+            message += f"（登録済み{counts['skipped']}曲を除く）"
+        self.screens['download'].message = message
+    
+    def scan_library(self):
+        """楽曲フォルダの差分スキャンをバックグラウンドで始める
+
+        新しいファイルのダイジェスト計算で大量に読み込むことがあるので、
+        メニューの描画を止めないよう別スレッドで行い、結果はメインループで受け取る。
+        """
+        if self.scan_thread is not None and self.scan_thread.is_alive():
+            return
+        self.scan_thread = threading.Thread(target=self.run_scan, name="library-scan", daemon=True)
+        self.scan_thread.start()
+    
+    def run_scan(self):
+        try:
+            self.scan_results.put(self.game_manager.scan_library())
+        except Exception as e:
+            print(f"ライブラリスキャンエラー: {e}")
+    
+    def handle_scan_results(self):
+        """終わったスキャンの結果から、追加・変更されたファイルを解析キューに入れる"""
+        try:
+            result = self.scan_results.get_nowait()
+        except queue.Empty:
+            return
+        for song_path in result.pending:
+            self.job_queue.submit_file(song_path)
+        if result.removed:
+            self.screens['song_select'].update_song_list()
+    
+    def handle_finished_jobs(self):
+        """バックグラウンドで終了したジョブの結果を画面に反映"""
+        for job in self.job_queue.poll_finished():
+            if job.status == "done":
                 self.screens['song_select'].update_song_list()
-                self.current_screen = 'song_select'
-            except Exception as e:
-                print(f"ダウンロードエラー: {str(e)}")
-                self.screens['download'].message = "エラーが発生しました"
\ No newline at end of file
+                self.screens['download'].message = "ダウンロード完了"
+            elif job.status == "failed":
+                print(f"ダウンロードエラー: {job.error}")
+                self.screens['download'].message = "エラーが発生しました"
@@ -0,0 +1,64 @@
+from typing import Iterator, List, Optional
+import pygame
+
+class ObstaclePool:
+    """固定容量のリングバッファで障害物を管理
+
+    障害物はすべて同じ速度で左へ流れるので、出現順に並べれば常に
+    先頭（最古）が一番左にある。画面外に出た障害物は先頭から順に
+    スロットを解放し、次の出現で再利用する。
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.spawn_time: List[float] = [0.0] * self.capacity
+        self.x: List[float] = [0.0] * self.capacity
+        self.y: List[float] = [0.0] * self.capacity
+        self.sprite: List[Optional[pygame.Surface]] = [None] * self.capacity
+        self.passed: List[bool] = [False] * self.capacity
+        self.hit: List[bool] = [False] * self.capacity
+        self.head = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def reset(self) -> None:
+        self.head = 0
+        self.count = 0
+
+    def full(self) -> bool:
+        return self.count == self.capacity
+
+    def drop_oldest(self) -> bool:
+        """最古の障害物を解放し、それが通過済みだったかを返す"""
+        passed = self.passed[self.head]
+        self.head = (self.head + 1) % self.capacity
+        self.count -= 1
+        return passed
+
+    def spawn(self, spawn_time: float, x: float, y: float,
+              sprite: Optional[pygame.Surface]) -> None:
+        """空きスロットに障害物を追加（呼び出し側で満杯でないことを確認する）"""
+        slot = (self.head + self.count) % self.capacity
+        self.spawn_time[slot] = spawn_time
+        self.x[slot] = x
+        self.y[slot] = y
+        self.sprite[slot] = sprite
+        self.passed[slot] = False
+        self.hit[slot] = False
+        self.count += 1
+
+    def slots(self) -> Iterator[int]:
+        """使用中のスロット番号を出現順（左から順）に返す"""
+        for i in range(self.count):
+            yield (self.head + i) % self.capacity
+
+    def release_before(self, min_x: float) -> int:
+        """x座標がmin_xより左に出た障害物を先頭から解放し、解放数を返す"""
+        released = 0
+        while self.count and self.x[self.head] < min_x:
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+            released += 1
+        return released
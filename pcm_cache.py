@@ -0,0 +1,23 @@
+import numpy as np
+from config import PCM_CACHE_DIR, PCM_CACHE_SETTINGS
+from analysis_cache import AnalysisCache
+
+class PCMCache(AnalysisCache):
+    """解析用のサンプリングレートにデコード済みのモノラルPCM（float32）のキャッシュ
+
+    1曲1ファイルの.npyとして保存し、読み込みはメモリマップで行うので
+    必要な部分だけがページインされる。キーと削除方針は解析キャッシュと同じ。
+    """
+
+    SUFFIX = '.npy'
+
+    def __init__(self, cache_dir: str = PCM_CACHE_DIR,
+                 max_entries: int = PCM_CACHE_SETTINGS['max_entries'],
+                 max_bytes: int = PCM_CACHE_SETTINGS['max_bytes']):
+        super().__init__(cache_dir, max_entries, max_bytes)
+
+    def _load(self, path: str) -> np.ndarray:
+        return np.load(path, mmap_mode='r')
+
+    def _save(self, f, data: np.ndarray) -> None:
+        np.save(f, np.ascontiguousarray(data, dtype=np.float32))
@@ -0,0 +1,91 @@
+import pygame
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+Color = Tuple[int, int, int]
+
+class RenderCache:
+    """フォントと描画済みテキストを保持する描画リソースキャッシュ
+
+    フォントはサイズごとに1回だけ生成し、固定文字列は初回描画時の
+    サーフェスを使い回す。スコアのように頻繁に変わる数値は数字ごとの
+    グリフを並べて描画する。
+    """
+
+    def __init__(self, font_path: Optional[str] = None):
+        self.font_path = font_path
+        self._fonts: Dict[int, pygame.font.Font] = {}
+        self._texts: Dict[Tuple[str, int, Color], pygame.Surface] = {}
+
+    def font(self, size: int) -> pygame.font.Font:
+        """指定サイズのフォントを返す"""
+        font = self._fonts.get(size)
+        if font is None:
+            font = pygame.font.Font(self.font_path, size)
+            self._fonts[size] = font
+        return font
+
+    def text(self, text: str, size: int, color: Color = (255, 255, 255)) -> pygame.Surface:
+        """描画済みのテキストサーフェスを返す"""
+        key = (text, size, color)
+        surface = self._texts.get(key)
+        if surface is None:
+            surface = self.font(size).render(text, True, color).convert_alpha()
+            self._texts[key] = surface
+        return surface
+
+    def blit_number(self, target: pygame.Surface, prefix: str, value: int,
+                    pos: Tuple[float, float], size: int,
+                    color: Color = (255, 255, 255)) -> pygame.Rect:
+        """接頭辞と数値をキャッシュ済みのグリフを並べて描画し、描画範囲を返す"""
+        x, y = pos
+        rect = target.blit(self.text(prefix, size, color), (x, y))
+        x = rect.right
+        for digit in str(value):
+            glyph_rect = target.blit(self.text(digit, size, color), (x, y))
+            x = glyph_rect.right
+            rect.union_ip(glyph_rect)
+        return rect
+
+class TextLayoutCache:
+    """幅に収まるよう省略した描画済みテキストを (文字列, 色, 最大幅) ごとに保持するLRUキャッシュ
+
+    省略位置は描画せずにfont.sizeで幅を測りながら二分探索で求める。
+    """
+
+    ELLIPSIS = "..."
+
+    def __init__(self, font: pygame.font.Font, max_entries: int = 512):
+        self.font = font
+        self.max_entries = max_entries
+        self._surfaces: "OrderedDict[Tuple[str, Color, int], pygame.Surface]" = OrderedDict()
+
+    def fit(self, text: str, max_width: int) -> str:
+        """max_widthに収まるようにtextの末尾を省略した文字列を返す"""
+        if self.font.size(text)[0] <= max_width:
+            return text
+        # 「先頭k文字+省略記号」が収まる最大のkを探す
+        low, high = 0, len(text) - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.font.size(text[:mid] + self.ELLIPSIS)[0] <= max_width:
+                low = mid
+            else:
+                high = mid - 1
+        return text[:low] + self.ELLIPSIS
+
+    def render(self, text: str, color: Color, max_width: int) -> pygame.Surface:
+        """省略済みの描画済みテキストサーフェスを返す"""
+        key = (text, color, max_width)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            return surface
+        surface = self.font.render(self.fit(text, max_width), True, color).convert_alpha()
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self) -> None:
+        self._surfaces.clear()
@@ -1,8 +1,10 @@
 import pygame
 import pyperclip
 import os
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
+from render_cache import TextLayoutCache
+from song_index import SongIndex
 
 @dataclass
 class MenuAction:
@@ -10,6 +12,8 @@ class MenuAction:
     screen: Optional[str] = None
     song_path: Optional[str] = None
     url: Optional[str] = None
+    job_id: Optional[int] = None
+    settings: Optional[Dict] = None
 
 class Screen:
     def __init__(self):
@@ -18,18 +22,37 @@ class Screen:
             self.font = pygame.font.Font(font_path, 36)
         else:
             self.font = pygame.font.SysFont(None, 36)
+        self.text_cache = TextLayoutCache(self.font)
         self.selected_index = 0
+        self.dirty = True  # 次のrender()で描画し直す必要があるか
+
+    def handle_events(self, events: List[pygame.event.Event]) -> Optional[MenuAction]:
+        """入力イベントを処理し、状態を変えたらdirtyを立てる"""
+        return None
+
+    def draw(self, surface: pygame.Surface) -> None:
+        """画面全体を描画"""
+
+    def invalidate(self) -> None:
+        self.dirty = True
+
+    def needs_redraw(self) -> bool:
+        return self.dirty
+
+    def render(self, surface: pygame.Surface) -> bool:
+        """状態が変わっていれば描画し直し、描画したかを返す"""
+        if not self.needs_redraw():
+            return False
+        self.draw(surface)
+        self.dirty = False
+        return True
 
     def draw_text(self, surface: pygame.Surface, text: str, pos: Tuple[int, int], selected: bool = False):
         color = (255, 255, 0) if selected else (255, 255, 255)
         max_width = surface.get_width() - 100
         
-        text_surface = self.font.render(text, True, color)
-        if text_surface.get_width() > max_width:
-            while text_surface.get_width() > max_width:
-                text = text[:-1] + "..."
-                text_surface = self.font.render(text, True, color)
-        
+        # 幅に収まるよう省略した描画結果を使い回すので、2回目以降は1回のblitで済む
+        text_surface = self.text_cache.render(text, color, max_width)
         rect = text_surface.get_rect(center=pos)
         surface.blit(text_surface, rect)
 
@@ -38,9 +61,10 @@ class TitleScreen(Screen):
         super().__init__()
         self.menu_items = ["曲を選ぶ", "曲をダウンロード", "設定", "終了"]
         
-    def update(self, surface: pygame.Surface) -> Optional[MenuAction]:
-        for event in pygame.event.get():
+    def handle_events(self, events: List[pygame.event.Event]) -> Optional[MenuAction]:
+        for event in events:
             if event.type == pygame.KEYDOWN:
+                self.dirty = True
                 if event.key == pygame.K_UP:
                     self.selected_index = (self.selected_index - 1) % len(self.menu_items)
                 elif event.key == pygame.K_DOWN:
@@ -54,7 +78,9 @@ class TitleScreen(Screen):
                         return MenuAction("CHANGE_SCREEN", screen="options")
                     elif self.menu_items[self.selected_index] == "終了":
                         return MenuAction("QUIT")
-        
+        return None
+
+    def draw(self, surface: pygame.Surface) -> None:
         surface.fill((0, 0, 0))
         title_pos = surface.get_width() // 2, 100
         self.draw_text(surface, "リズムゲーム", title_pos)
@@ -63,24 +89,60 @@ class TitleScreen(Screen):
         for i, item in enumerate(self.menu_items):
             pos = (surface.get_width() // 2, start_y + i * 50)
             self.draw_text(surface, item, pos, i == self.selected_index)
-        
-        return None
 
 class DownloadScreen(Screen):
-    def __init__(self):
+    def __init__(self, job_queue):
         super().__init__()
+        self.job_queue = job_queue
         self.input_text = ""
         self.message = ""
+        self.max_visible_jobs = 5
+        self.drawn_state = None
+    
+    def visible_jobs(self) -> list:
+        return self.job_queue.get_jobs()[-self.max_visible_jobs:]
+    
+    def job_summary(self) -> str:
+        """一括取り込みなどで表示しきれないジョブがあるときの状態別の件数"""
+        jobs = self.job_queue.get_jobs()
+        if len(jobs) <= self.max_visible_jobs:
+            return ""
+        counts: Dict[str, int] = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        labels = (("queued", "待機"), ("running", "実行中"), ("done", "完了"), ("failed", "失敗"))
+        return " / ".join(f"{label} {counts.get(status, 0)}" for status, label in labels)
+    
+    def needs_redraw(self) -> bool:
+        # ジョブの進捗はバックグラウンドで変わるので、表示内容が前回の描画と違えば描き直す
+        state = (self.message, self.job_summary(), tuple(
+            (job.id, job.status, job.message, job.progress) for job in self.visible_jobs()
+        ))
+        if state != self.drawn_state:
+            self.drawn_state = state
+            return True
+        return self.dirty
     
-    def update(self, surface: pygame.Surface) -> Optional[MenuAction]:
-        for event in pygame.event.get():
+    def handle_events(self, events: List[pygame.event.Event]) -> Optional[MenuAction]:
+        jobs = self.visible_jobs()
+        if jobs:
+            self.selected_index = min(self.selected_index, len(jobs) - 1)
+        for event in events:
             if event.type == pygame.KEYDOWN:
+                self.dirty = True
                 if event.key == pygame.K_ESCAPE:
                     return MenuAction("CHANGE_SCREEN", screen="title")
                 elif event.key == pygame.K_RETURN and self.input_text:
-                    return MenuAction("DOWNLOAD", url=self.input_text)
+                    url, self.input_text = self.input_text, ""
+                    return MenuAction("DOWNLOAD", url=url)
                 elif event.key == pygame.K_BACKSPACE:
                     self.input_text = self.input_text[:-1]
+                elif event.key == pygame.K_UP and jobs:
+                    self.selected_index = (self.selected_index - 1) % len(jobs)
+                elif event.key == pygame.K_DOWN and jobs:
+                    self.selected_index = (self.selected_index + 1) % len(jobs)
+                elif event.key == pygame.K_DELETE and jobs:
+                    return MenuAction("CANCEL_JOB", job_id=jobs[self.selected_index].id)
                 elif event.key == pygame.K_v and pygame.key.get_mods() & pygame.KMOD_META:
                     try:
                         self.input_text += pyperclip.paste()
@@ -88,48 +150,129 @@ class DownloadScreen(Screen):
                         print(f"クリップボードエラー: {e}")
                 else:
                     self.input_text += event.unicode
-        
+        return None
+
+    def draw(self, surface: pygame.Surface) -> None:
+        jobs = self.visible_jobs()
+        if jobs:
+            self.selected_index = min(self.selected_index, len(jobs) - 1)
         surface.fill((0, 0, 0))
-        self.draw_text(surface, "YouTubeのURLを入力:", (surface.get_width() // 2, 150))
-        self.draw_text(surface, self.input_text, (surface.get_width() // 2, 200))
+        self.draw_text(surface, "YouTubeのURLを入力:", (surface.get_width() // 2, 100))
+        self.draw_text(surface, self.input_text, (surface.get_width() // 2, 150))
         if self.message:
-            self.draw_text(surface, self.message, (surface.get_width() // 2, 300))
-        return None
+            self.draw_text(surface, self.message, (surface.get_width() // 2, 200))
+        summary = self.job_summary()
+        if summary:
+            self.draw_text(surface, summary, (surface.get_width() // 2, 240))
+        
+        start_y = 290
+        for i, job in enumerate(jobs):
+            y = start_y + i * 60
+            self.draw_progress_bar(surface, job.progress, y + 22)
+            self.draw_text(surface, f"{job.message} {job.progress}%", (surface.get_width() // 2, y),
+                           i == self.selected_index)
+    
+    def draw_progress_bar(self, surface: pygame.Surface, progress: int, y: int):
+        width = surface.get_width() - 200
+        x = (surface.get_width() - width) // 2
+        pygame.draw.rect(surface, (80, 80, 80), (x, y, width, 6))
+        pygame.draw.rect(surface, (0, 200, 0), (x, y, int(width * progress / 100), 6))
 
 class SongSelectScreen(Screen):
+    """楽曲選択画面
+
+    表示範囲の行だけを描画し、選択位置に合わせてスクロールする。
+    文字を入力するとタイトルで絞り込み、Backspaceで1文字戻す。
+    """
+
     def __init__(self, song_library):
         super().__init__()
         self.song_library = song_library
-        self.songs = []
+        self.index = SongIndex([])
+        self.query = ""
+        self.matches: List[int] = []  # 絞り込み結果（indexの位置）
+        self.scroll_top = 0
+        self.list_top = 150
+        self.row_height = 50
         self.update_song_list()
     
     def update_song_list(self):
-        self.songs = self.song_library.get_song_list()
+        self.index = SongIndex(self.song_library.get_song_titles())
+        self.matches = self.index.search(self.query)
+        self.selected_index = min(self.selected_index, max(len(self.matches) - 1, 0))
+        self.dirty = True
     
-    def update(self, surface: pygame.Surface) -> Optional[MenuAction]:
-        for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
+    def set_query(self, query: str):
+        self.query = query
+        self.matches = self.index.search(query)
+        self.selected_index = 0
+        self.scroll_top = 0
+    
+    def handle_events(self, events: List[pygame.event.Event]) -> Optional[MenuAction]:
+        page = max(1, self.visible_rows(pygame.display.get_surface()) - 1)
+        for event in events:
+            if event.type == pygame.TEXTINPUT:
+                self.dirty = True
+                self.set_query(self.query + event.text)
+            elif event.type == pygame.KEYDOWN:
+                self.dirty = True
                 if event.key == pygame.K_ESCAPE:
-                    return MenuAction("CHANGE_SCREEN", screen="title")
-                elif event.key == pygame.K_UP and self.songs:
-                    self.selected_index = (self.selected_index - 1) % len(self.songs)
-                elif event.key == pygame.K_DOWN and self.songs:
-                    self.selected_index = (self.selected_index + 1) % len(self.songs)
-                elif event.key == pygame.K_RETURN and self.songs:
-                    return MenuAction("START_GAME", song_path=self.songs[self.selected_index])
-        
+                    if self.query:
+                        self.set_query("")
+                    else:
+                        return MenuAction("CHANGE_SCREEN", screen="title")
+                elif event.key == pygame.K_BACKSPACE and self.query:
+                    self.set_query(self.query[:-1])
+                elif event.key == pygame.K_UP and self.matches:
+                    self.selected_index = (self.selected_index - 1) % len(self.matches)
+                elif event.key == pygame.K_DOWN and self.matches:
+                    self.selected_index = (self.selected_index + 1) % len(self.matches)
+                elif event.key == pygame.K_PAGEUP and self.matches:
+                    self.selected_index = max(self.selected_index - page, 0)
+                elif event.key == pygame.K_PAGEDOWN and self.matches:
+                    self.selected_index = min(self.selected_index + page, len(self.matches) - 1)
+                elif event.key == pygame.K_HOME:
+                    self.selected_index = 0
+                elif event.key == pygame.K_END and self.matches:
+                    self.selected_index = len(self.matches) - 1
+                elif event.key == pygame.K_RETURN and self.matches:
+                    song_path = self.index.paths[self.matches[self.selected_index]]
+                    return MenuAction("START_GAME", song_path=song_path)
+                elif event.key == pygame.K_F5:
+                    return MenuAction("RESCAN")
+        return None
+
+    def visible_rows(self, surface: Optional[pygame.Surface]) -> int:
+        if surface is None:
+            return 1
+        return max(1, (surface.get_height() - self.list_top) // self.row_height)
+
+    def draw(self, surface: pygame.Surface) -> None:
         surface.fill((0, 0, 0))
-        if not self.songs:
+        if self.query or len(self.index) > 0:
+            status = f"検索: {self.query}  ({len(self.matches)}/{len(self.index)})"
+            self.draw_text(surface, status, (surface.get_width() // 2, 80))
+        if not self.matches:
             self.draw_text(surface, "曲が見つかりません", (surface.get_width() // 2, 200))
-            return None
+            return
         
-        start_y = 150
-        for i, song in enumerate(self.songs):
-            pos = (surface.get_width() // 2, start_y + i * 50)
-            self.draw_text(surface, os.path.basename(song), pos, i == self.selected_index)
-        return None
+        # 選択中の行が表示範囲に入るようにスクロールし、表示範囲の行だけ描画する
+        rows = self.visible_rows(surface)
+        if self.selected_index < self.scroll_top:
+            self.scroll_top = self.selected_index
+        elif self.selected_index >= self.scroll_top + rows:
+            self.scroll_top = self.selected_index - rows + 1
+        self.scroll_top = max(0, min(self.scroll_top, len(self.matches) - rows))
+        
+        titles = self.index.titles
+        for row, i in enumerate(range(self.scroll_top, min(self.scroll_top + rows, len(self.matches)))):
+            pos = (surface.get_width() // 2, self.list_top + row * self.row_height)
+            self.draw_text(surface, titles[self.matches[i]], pos, i == self.selected_index)
 
 class OptionsScreen(Screen):
+    # 難易度の設定値と表示名（譜面は登録時に難易度ごとに作ってあるので切り替えは即時）
+    DIFFICULTIES = (("easy", "かんたん"), ("normal", "普通"), ("hard", "むずかしい"))
+
     def __init__(self):
         super().__init__()
         self.options = {
@@ -137,14 +280,29 @@ class OptionsScreen(Screen):
             "難易度": "普通",
             "フルスクリーン": True
         }
+        self.difficulty_index = 1
         self.selected_index = 0
     
-    def update(self, surface: pygame.Surface) -> Optional[MenuAction]:
-        for event in pygame.event.get():
+    def handle_events(self, events: List[pygame.event.Event]) -> Optional[MenuAction]:
+        for event in events:
             if event.type == pygame.KEYDOWN:
+                self.dirty = True
                 if event.key == pygame.K_ESCAPE:
                     return MenuAction("CHANGE_SCREEN", screen="title")
-        
+                elif event.key == pygame.K_UP:
+                    self.selected_index = (self.selected_index - 1) % len(self.options)
+                elif event.key == pygame.K_DOWN:
+                    self.selected_index = (self.selected_index + 1) % len(self.options)
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    if list(self.options)[self.selected_index] == "難易度":
+                        step = 1 if event.key == pygame.K_RIGHT else -1
+                        self.difficulty_index = (self.difficulty_index + step) % len(self.DIFFICULTIES)
+                        difficulty, label = self.DIFFICULTIES[self.difficulty_index]
+                        self.options["難易度"] = label
+                        return MenuAction("UPDATE_SETTINGS", settings={"difficulty": difficulty})
+        return None
+
+    def draw(self, surface: pygame.Surface) -> None:
         surface.fill((0, 0, 0))
         self.draw_text(surface, "設定", (surface.get_width() // 2, 100))
         
@@ -152,4 +310,3 @@ class OptionsScreen(Screen):
         for i, (key, value) in enumerate(self.options.items()):
             pos = (surface.get_width() // 2, start_y + i * 50)
             self.draw_text(surface, f"{key}: {value}", pos, i == self.selected_index)
-        return None
@@ -1,20 +1,57 @@
+import time
+from contextlib import contextmanager
 import librosa
 import numpy as np
-import json
-import os
-from typing import Dict, List, Optional, Tuple
+import scipy.fft
+import soundfile as sf
+import soxr
+from typing import Dict, Iterator, Optional, Tuple
+from analysis_cache import AnalysisCache
+from pcm_cache import PCMCache
+from chart import compile_chart
+from config import ANALYSIS_SETTINGS, ANALYSIS_PROFILES, PCM_CACHE_SETTINGS, CHART_SETTINGS
+
+# 解析アルゴリズムのバージョン（結果が変わる変更をしたら上げる）
+ANALYSIS_VERSION = 3
+
+# 特徴量抽出のパラメータ（librosaのデフォルトに合わせる）
+ANALYSIS_SR = 22050
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MFCC = 20
+TOP_DB = 80.0
+TEMPO_AC_SIZE = 8.0        # テンポ推定の自己相関窓（秒、librosa.feature.tempoの既定値）
 
 class SongAnalyzer:
     def __init__(self):
-        self.jump_speed = 15
-        self.gravity = 0.8
-        self.obstacle_speed = 5
-        self.cache_dir = "cache"
-        os.makedirs(self.cache_dir, exist_ok=True)
+        self.jump_speed = CHART_SETTINGS['jump_speed']
+        self.gravity = CHART_SETTINGS['gravity']
+        self.obstacle_speed = CHART_SETTINGS['obstacle_speed']
+        self.min_interval = CHART_SETTINGS['min_interval']
+        self.profile = ANALYSIS_SETTINGS['profile']
+        self.streaming = ANALYSIS_SETTINGS['streaming']
+        self.stream_block_seconds = ANALYSIS_SETTINGS['stream_block_seconds']
+        self.cache = AnalysisCache()
+        self.pcm_cache = PCMCache() if PCM_CACHE_SETTINGS['enabled'] else None
+        # 辞書を設定すると処理段階ごとの所要時間（秒）を記録する（ベンチマーク用）
+        self.stage_times: Optional[Dict[str, float]] = None
+
+    @contextmanager
+    def _stage(self, name: str) -> Iterator[None]:
+        """stage_timesが設定されていればnameの段階の所要時間を加算"""
+        if self.stage_times is None:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_times[name] = self.stage_times.get(name, 0.0) + time.perf_counter() - started
 
     def analyze_song(self, file_path: str, progress_callback=None) -> Dict:
         """楽曲を解析してリズムデータを生成"""
-        cached_data = self._get_cached_analysis(file_path)
+        with self._stage('cache_lookup'):
+            cached_data = self._get_cached_analysis(file_path)
         if cached_data:
             return cached_data
 
@@ -22,23 +59,21 @@ class SongAnalyzer:
             progress_callback("音楽ファイルを解析中...", 0)
 
         try:
-            y, sr, onset_env, beats, chroma, mfcc = self._analyze_music(file_path)
+            analyze = self._analyze_music_streaming if self.streaming else self._analyze_music
+            duration, sr, onset_env, beats, tempo, chroma_scores, mfcc_scores = analyze(file_path)
             
             if progress_callback:
                 progress_callback("リズムパターンを生成中...", 50)
             
-            rhythm_patterns = self._generate_rhythm_patterns(
-                y, sr, onset_env, beats, chroma, mfcc,
-                self.jump_speed, self.gravity, self.obstacle_speed
-            )
-
-            result = {
-                'rhythm_patterns': rhythm_patterns,
-                'tempo': float(librosa.beat.tempo(onset_envelope=onset_env, sr=sr)[0]),
-                'duration': float(librosa.get_duration(y=y, sr=sr))
-            }
+            with self._stage('pattern'):
+                features = self._onset_features(
+                    duration, sr, onset_env, beats, tempo, chroma_scores, mfcc_scores
+                )
+                result = self.compile(features)
 
-            self._cache_analysis(file_path, result)
+            # 譜面は設定からすぐ作り直せるので、キャッシュには特徴量だけを保存する
+            with self._stage('cache_write'):
+                self._cache_analysis(file_path, features)
             
             if progress_callback:
                 progress_callback("解析完了", 100)
@@ -48,92 +83,223 @@ class SongAnalyzer:
         except Exception as e:
             raise RuntimeError(f"楽曲解析エラー: {str(e)}")
 
-    def _analyze_music(self, file_path: str) -> Tuple[np.ndarray, int, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-        """音楽ファイルの基本的な特徴量を抽出"""
-        y, sr = librosa.load(file_path)
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-        tempo, beats = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)
-        chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-        mfcc = librosa.feature.mfcc(y=y, sr=sr)
-        return y, sr, onset_env, beats, chroma, mfcc
-
-    def _generate_rhythm_patterns(
-        self, y: np.ndarray, sr: int, onset_env: np.ndarray, 
-        beats: np.ndarray, chroma: np.ndarray, mfcc: np.ndarray,
-        jump_speed: float, gravity: float, obstacle_speed: float,
-        min_interval: float = 0.8
-    ) -> List[Dict]:
-        """リズムパターンを生成"""
-        patterns = []
-        apex_time = jump_speed / gravity
+    def warm_up(self) -> None:
+        """短い合成音で特徴量抽出を一度実行し、numbaのJITコンパイルを済ませておく"""
+        y = np.random.default_rng(0).standard_normal(ANALYSIS_SR * 2).astype(np.float32) * 0.1
+        self._extract_features(y, ANALYSIS_SR)
+
+    def _analyze_music(self, file_path: str) -> Tuple[float, int, np.ndarray, np.ndarray, float,
+                                                      Optional[np.ndarray], Optional[np.ndarray]]:
+        """音楽ファイルを読み込み、特徴量を抽出"""
+        sr = ANALYSIS_SR
+        with self._stage('decode'):
+            y = self._load_pcm(file_path)
+            duration = float(librosa.get_duration(y=y, sr=sr))
+        return (duration, sr) + self._extract_features(y, sr)
+
+    def _get_cached_pcm(self, file_path: str) -> Optional[np.ndarray]:
+        """キャッシュ済みのPCMをメモリマップで返す"""
+        if self.pcm_cache is None:
+            return None
+        return self.pcm_cache.get(self.pcm_cache.make_key(file_path, {'sr': ANALYSIS_SR}))
+
+    def _load_pcm(self, file_path: str) -> np.ndarray:
+        """解析用レートのモノラルPCMを返す（初回はデコードしてキャッシュに保存）"""
+        y = self._get_cached_pcm(file_path)
+        if y is None:
+            y, _ = librosa.load(file_path, sr=ANALYSIS_SR)
+            if self.pcm_cache is not None:
+                self.pcm_cache.put(self.pcm_cache.make_key(file_path, {'sr': ANALYSIS_SR}), y)
+        return y
+
+    def _stream_pcm(self, file_path: str) -> Iterator[np.ndarray]:
+        """解析用レートのモノラルPCMをブロック単位で返す（キャッシュ済みならそこから読む）"""
+        cached = self._get_cached_pcm(file_path)
+        if cached is not None:
+            block_size = max(N_FFT, int(self.stream_block_seconds * ANALYSIS_SR))
+            for start in range(0, len(cached), block_size):
+                yield np.asarray(cached[start:start + block_size])
+            return
+        with sf.SoundFile(file_path) as f:
+            block_size = max(N_FFT, int(self.stream_block_seconds * f.samplerate))
+            resampler = soxr.ResampleStream(f.samplerate, ANALYSIS_SR, 1, dtype='float32', quality='HQ')
+            for block in f.blocks(blocksize=block_size, dtype='float32', always_2d=True):
+                yield resampler.resample_chunk(block.mean(axis=1))
+            yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+    def _extract_features(self, y: np.ndarray, sr: int) -> Tuple[np.ndarray, np.ndarray, float,
+                                                                 Optional[np.ndarray], Optional[np.ndarray]]:
+        """STFTを1回だけ計算し、プロファイルに応じた特徴量をすべてそこから導出"""
+        features = ANALYSIS_PROFILES[self.profile]
+        with self._stage('stft'):
+            power = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)) ** 2
+            mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=power, sr=sr), top_db=TOP_DB)
+        
+        with self._stage('onset'):
+            onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr, hop_length=HOP_LENGTH)
+        with self._stage('beats'):
+            tempo, beats = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH)
         
+        chroma_scores = mfcc_scores = None
+        if features['chroma']:
+            with self._stage('chroma'):
+                chroma = librosa.feature.chroma_stft(S=power, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+                chroma_scores = np.max(chroma, axis=0)
+        if features['mfcc']:
+            with self._stage('mfcc'):
+                mfcc = librosa.feature.mfcc(S=mel_db, n_mfcc=N_MFCC)
+                # 列を連続配置にしてから集約し、列ごとに計算した場合と同じ丸め結果にする
+                mfcc_scores = np.std(np.ascontiguousarray(mfcc.T), axis=1)
+        return onset_env, beats, float(np.atleast_1d(tempo)[0]), chroma_scores, mfcc_scores
+
+    def _analyze_music_streaming(self, file_path: str) -> Tuple[float, int, np.ndarray, np.ndarray, float,
+                                                                Optional[np.ndarray], Optional[np.ndarray]]:
+        """音声をブロック単位で読み込み、メモリ使用量を抑えて特徴量を抽出
+
+        音声・スペクトログラムはブロック分しか保持せず、曲全体で持つのは
+        フレームごとのスカラー（オンセット強度・クロマ/MFCCスコア）だけにする。
+        power_to_dbのtop_dbクリップとチューニング推定は曲全体ではなく
+        それまでに読んだ範囲で行うため、通常モードとは値がわずかに異なる。
+        """
+        sr = ANALYSIS_SR
+        features = ANALYSIS_PROFILES[self.profile]
+        window = librosa.filters.get_window('hann', N_FFT, fftbins=True).reshape(-1, 1)
+        mel_basis = librosa.filters.mel(sr=sr, n_fft=N_FFT)
+        chroma_basis = None
+        db_max = -np.inf
+        prev_db = None
+        onset_diffs, chroma_scores, mfcc_scores = [], [], []
+        total_samples = 0
+
+        def process(buf: np.ndarray) -> np.ndarray:
+            """バッファから取り出せるフレームを処理し、残りのサンプルを返す"""
+            nonlocal chroma_basis, db_max, prev_db
+            n_frames = 1 + (len(buf) - N_FFT) // HOP_LENGTH
+            if n_frames <= 0:
+                return buf
+            frames = librosa.util.frame(
+                buf[:(n_frames - 1) * HOP_LENGTH + N_FFT],
+                frame_length=N_FFT, hop_length=HOP_LENGTH
+            )
+            power = np.abs(np.fft.rfft(frames * window, axis=0)) ** 2
+
+            if features['chroma']:
+                if chroma_basis is None:
+                    tuning = librosa.estimate_tuning(S=power, sr=sr, n_fft=N_FFT)
+                    chroma_basis = librosa.filters.chroma(sr=sr, n_fft=N_FFT, tuning=tuning)
+                chroma = librosa.util.normalize(chroma_basis @ power, norm=np.inf, axis=0)
+                chroma_scores.append(np.max(chroma, axis=0).astype(np.float32))
+
+            db = 10.0 * np.log10(np.maximum(1e-10, mel_basis @ power))
+            db_max = max(db_max, float(db.max()))
+            db = np.maximum(db, db_max - TOP_DB)
+            if features['mfcc']:
+                mfcc = scipy.fft.dct(db, axis=0, type=2, norm='ortho')[:N_MFCC]
+                mfcc_scores.append(np.std(mfcc, axis=0).astype(np.float32))
+
+            if prev_db is not None:
+                db = np.concatenate([prev_db, db], axis=1)
+            onset_diffs.append(np.mean(np.maximum(0.0, np.diff(db, axis=1)), axis=0).astype(np.float32))
+            prev_db = db[:, -1:]
+            return buf[n_frames * HOP_LENGTH:]
+
+        # デコードと特徴量抽出はブロックごとに交互に行うので、まとめて'stream'として計測する
+        with self._stage('stream'):
+            buf = np.zeros(N_FFT // 2, dtype=np.float32)
+            for chunk in self._stream_pcm(file_path):
+                total_samples += len(chunk)
+                buf = process(np.concatenate([buf, chunk]))
+            process(np.concatenate([buf, np.zeros(N_FFT // 2, dtype=np.float32)]))
+
+        n_frames = 1 + total_samples // HOP_LENGTH
+        pad = 1 + N_FFT // (2 * HOP_LENGTH)
+        onset_env = np.concatenate([np.zeros(pad, dtype=np.float32)] + onset_diffs)[:n_frames]
+        chroma_scores = np.concatenate(chroma_scores)[:n_frames] if chroma_scores else None
+        mfcc_scores = np.concatenate(mfcc_scores)[:n_frames] if mfcc_scores else None
+        with self._stage('beats'):
+            # テンポを渡すとbeat_trackは曲全体のテンポグラムを作らず、フレーム数に比例する
+            # 動的計画法だけを行う
+            tempo = self._stream_tempo(onset_env, sr) if onset_env.any() else 0.0
+            _, beats = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr,
+                                               hop_length=HOP_LENGTH, bpm=tempo)
+        return (total_samples / sr, sr, onset_env, beats, tempo, chroma_scores, mfcc_scores)
+
+    def _stream_tempo(self, onset_env: np.ndarray, sr: int) -> float:
+        """テンポグラムの時間平均をブロックごとに積算してテンポを推定する
+
+        librosa.feature.tempoと同じ値になるが、自己相関を一度に持つのは
+        stream_block_seconds分のフレームだけなので、曲の長さによらずメモリが一定になる。
+        """
+        win_length = librosa.time_to_frames(TEMPO_AC_SIZE, sr=sr, hop_length=HOP_LENGTH).item()
+        block_frames = max(1, int(self.stream_block_seconds * sr / HOP_LENGTH))
+        n = len(onset_env)
+        padded = np.pad(onset_env, win_length // 2, mode='linear_ramp', end_values=[0, 0])
+        odf_frames = librosa.util.frame(padded, frame_length=win_length, hop_length=1)[:, :n]
+        ac_window = librosa.filters.get_window('hann', win_length, fftbins=True).reshape(-1, 1)
+        total = np.zeros(win_length)
+        for start in range(0, n, block_frames):
+            ac = librosa.autocorrelate(odf_frames[:, start:start + block_frames] * ac_window, axis=0)
+            total += librosa.util.normalize(ac, norm=np.inf, axis=0).sum(axis=1)
+        tempo = librosa.feature.tempo(tg=(total / n).reshape(-1, 1), sr=sr, hop_length=HOP_LENGTH)
+        return float(tempo[0])
+
+    def _onset_features(
+        self, song_duration: float, sr: int, onset_env: np.ndarray, beats: np.ndarray,
+        tempo: float, chroma_scores: Optional[np.ndarray], mfcc_scores: Optional[np.ndarray]
+    ) -> Dict:
+        """オンセットごとの特徴量を求める（物理・難易度の設定に依存しない部分）"""
         onsets = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr)
+        onset_times = librosa.frames_to_time(onsets, sr=sr)
         beat_times = librosa.frames_to_time(beats, sr=sr)
-        
-        song_duration = librosa.get_duration(y=y, sr=sr)
-        target_points = int(song_duration / 2)
-        last_obstacle_time = -min_interval
-        
-        for onset in librosa.frames_to_time(onsets):
-            if onset - last_obstacle_time >= min_interval:
-                frame = librosa.time_to_frames(onset, sr=sr)
-                
-                chroma_score = np.max(chroma[:, frame])
-                mfcc_score = np.std(mfcc[:, frame])
-                beat_score = 1 if np.min(np.abs(beat_times - onset)) < 0.05 else 0
-                
-                rhythm_strength = (chroma_score + mfcc_score + beat_score) / 3
-                jump_time = onset - apex_time
-                
-                if jump_time > 0:
-                    patterns.append({
-                        "jump_time": float(jump_time),
-                        "obstacle_time": float(onset),
-                        "start_time": float(jump_time - 0.2),
-                        "end_time": float(jump_time + 0.2),
-                        "rhythm_strength": float(rhythm_strength),
-                        "variation": "normal"
-                    })
-                    last_obstacle_time = onset
-
-        self._add_additional_patterns(patterns, target_points, song_duration, apex_time)
-        return patterns
-
-    def _add_additional_patterns(
-        self, patterns: List[Dict], target_points: int, 
-        song_duration: float, apex_time: float
-    ) -> None:
-        """追加のリズムポイントを挿入"""
-        if len(patterns) < target_points:
-            additional_points = target_points - len(patterns)
-            interval = song_duration / additional_points
-            
-            for i in range(additional_points):
-                time = (len(patterns) + i + 1) * interval
-                if time > song_duration:
-                    break
-                    
-                jump_time = time - apex_time
-                if jump_time > 0:
-                    patterns.append({
-                        "jump_time": float(jump_time),
-                        "obstacle_time": float(time),
-                        "start_time": float(jump_time - 0.2),
-                        "end_time": float(jump_time + 0.2),
-                        "rhythm_strength": 0.5,
-                        "variation": "normal"
-                    })
+        frames = librosa.time_to_frames(onset_times, sr=sr)
+        empty = np.zeros(0, dtype=np.float32)
+        return {
+            'onset_times': onset_times,
+            'onset_scores': onset_env[frames] / max(float(np.max(onset_env)), 1e-10),
+            'beat_scores': self._beat_scores(onset_times, beat_times),
+            'chroma_scores': chroma_scores[frames] if chroma_scores is not None else empty,
+            'mfcc_scores': mfcc_scores[frames] if mfcc_scores is not None else empty,
+            'beat_times': beat_times,
+            'duration': song_duration,
+            'tempo': tempo
+        }
+
+    def _beat_scores(self, times: np.ndarray, beat_times: np.ndarray, tolerance: float = 0.05) -> np.ndarray:
+        """各時刻の最寄りビートまでの距離がtolerance未満なら1、それ以外は0"""
+        if len(beat_times) == 0:
+            return np.zeros(len(times))
+        idx = np.searchsorted(beat_times, times)
+        left = beat_times[np.clip(idx - 1, 0, len(beat_times) - 1)]
+        right = beat_times[np.clip(idx, 0, len(beat_times) - 1)]
+        distance = np.minimum(np.abs(times - left), np.abs(times - right))
+        return (distance < tolerance).astype(int)
+
+    def compile(self, features: Dict) -> Dict:
+        """特徴量から現在の物理・難易度設定の譜面を組み立て、リズムデータとして返す"""
+        return {
+            'chart': compile_chart(features, self.jump_speed, self.gravity, self.min_interval),
+            'tempo': features['tempo'],
+            'duration': features['duration'],
+            'features': features
+        }
+
+    def _analysis_params(self) -> Dict:
+        """キャッシュキーに含める解析パラメータ（譜面の設定は含めない）"""
+        return {
+            'version': ANALYSIS_VERSION,
+            'profile': self.profile,
+            'streaming': self.streaming
+        }
 
     def _get_cached_analysis(self, file_path: str) -> Optional[Dict]:
-        """キャッシュされた解析結果を取得"""
-        cache_path = os.path.join(self.cache_dir, f"{hash(file_path)}.json")
-        if os.path.exists(cache_path):
-            with open(cache_path, 'r') as f:
-                return json.load(f)
-        return None
-
-    def _cache_analysis(self, file_path: str, data: Dict) -> None:
-        """解析結果をキャッシュ"""
-        cache_path = os.path.join(self.cache_dir, f"{hash(file_path)}.json")
-        with open(cache_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        """キャッシュされた特徴量から現在の設定の譜面を組み立てて返す"""
+        features = self.cache.get(self.cache.make_key(file_path, self._analysis_params()))
+        return self.compile(features) if features else None
+
+    def _cache_analysis(self, file_path: str, features: Dict) -> None:
+        """特徴量をキャッシュ"""
+        self.cache.put(self.cache.make_key(file_path, self._analysis_params()), features)
+
+    def get_cache_stats(self) -> Dict:
+        """解析キャッシュの統計情報を返す"""
+        return self.cache.get_stats()
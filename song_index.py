@@ -0,0 +1,39 @@
+import unicodedata
+from typing import List, Sequence, Tuple
+
+# カタカナをひらがなに寄せて、どちらで入力しても一致させる
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord('ァ'), ord('ヶ') + 1)}
+
+def normalize(text: str) -> str:
+    """検索用に全角半角・大文字小文字・カタカナひらがなの違いをなくす"""
+    return unicodedata.normalize('NFKC', text).casefold().translate(_KATAKANA_TO_HIRAGANA)
+
+class SongIndex:
+    """楽曲タイトルの部分一致検索用インデックス
+
+    タイトルは構築時に一度だけ正規化しておく。検索語が前回の検索語を
+    延長したものなら前回の結果の中だけを絞り込むので、1文字ずつ入力する
+    インクリメンタル検索では候補が入力に従って減っていく。
+    """
+
+    def __init__(self, songs: Sequence[Tuple[str, str]]):
+        self.paths = [path for path, _ in songs]
+        self.titles = [title for _, title in songs]
+        self.keys = [normalize(title) for title in self.titles]
+        self.query = ""
+        self.results: List[int] = list(range(len(self.keys)))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, query: str) -> List[int]:
+        """タイトルにqueryを含む楽曲のインデックスを登録順に返す"""
+        key = normalize(query)
+        if key.startswith(self.query):
+            candidates = self.results
+        else:
+            candidates = range(len(self.keys))
+        keys = self.keys
+        self.results = [i for i in candidates if key in keys[i]] if key else list(candidates)
+        self.query = key
+        return self.results
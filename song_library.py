@@ -1,56 +1,249 @@
-import yt_dlp
-import json
+import glob
+import hashlib
 import os
+import sqlite3
+import threading
 from datetime import datetime
-from utils import load_json, save_json
-from config import SONGS_DIR
+from utils import load_json
+from typing import Dict, Optional
+from chart import (save_chart, load_chart, export_json, import_json, from_legacy,
+                   save_features, load_features, compile_chart)
+from config import SONGS_DIR, LIBRARY_DB, CHART_SETTINGS, DIFFICULTY_PRESETS, DOWNLOAD_SETTINGS
+
+def chart_settings(difficulty: Optional[str] = None, overrides: Optional[Dict] = None) -> Dict:
+    """既定の譜面設定に難易度のプリセットと個別の上書きを重ねる"""
+    settings = dict(CHART_SETTINGS)
+    settings.update(DIFFICULTY_PRESETS.get(difficulty, {}))
+    settings.update(overrides or {})
+    return settings
 
 class SongLibrary:
+    """楽曲ライブラリ（メタデータはSQLite、譜面は.npyファイルで管理）
+
+    譜面ファイル<stem>.npyの隣に、解析で得た特徴量<stem>.features.npzと
+    難易度ごとの譜面<stem>.<難易度>.npyを置く。特徴量があれば音声を
+    解析し直さずに任意の設定の譜面を組み立てられる。
+    """
+
     def __init__(self):
         self.songs_dir = SONGS_DIR
-        self.data_file = os.path.join(SONGS_DIR, "song_data.json")
-        self.song_data = {}
+        self.db_file = LIBRARY_DB
+        self.legacy_data_file = os.path.join(SONGS_DIR, "song_data.json")
+        self.charts_dir = os.path.join(SONGS_DIR, "charts")
+        self._lock = threading.Lock()
+        os.makedirs(self.songs_dir, exist_ok=True)
+        # ジョブキューのワーカースレッドからも書き込むため、接続はロックで共有する
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
         self.load_library()
     
     def add_song(self, song_path: str, rhythm_data: dict):
-        """新しい楽曲とそのリズムデータを追加"""
-        self.song_data[song_path] = {
-            'rhythm_data': rhythm_data,
-            'added_date': datetime.now().isoformat()
+        """新しい楽曲とそのリズムデータを追加（1行を1トランザクションで書き込む）"""
+        self.add_songs({song_path: rhythm_data})
+    
+    def add_songs(self, songs: dict):
+        """複数の楽曲を1トランザクションでまとめて追加"""
+        added_date = datetime.now().isoformat()
+        rows = [
+            self._store_rhythm_data(song_path, rhythm_data, added_date)
+            for song_path, rhythm_data in songs.items()
+        ]
+        with self._lock, self.conn:
+            self._upsert(rows)
+    
+    def remove_songs(self, song_paths: list):
+        """楽曲をライブラリから削除（譜面ファイルも削除する）"""
+        if not song_paths:
+            return
+        with self._lock, self.conn:
+            chart_files = [
+                row['chart_file'] for path in song_paths
+                for row in self.conn.execute("SELECT chart_file FROM songs WHERE path = ?", (path,))
+            ]
+            self.conn.executemany("DELETE FROM songs WHERE path = ?", [(path,) for path in song_paths])
+        for chart_file in chart_files:
+            # 難易度別の譜面と特徴量も同じstemで始まる
+            stem = os.path.splitext(chart_file)[0]
+            for path in [os.path.join(self.charts_dir, chart_file)] + glob.glob(
+                    os.path.join(self.charts_dir, glob.escape(stem) + ".*")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+    
+    def _store_rhythm_data(self, song_path: str, rhythm_data: dict, added_date: str) -> dict:
+        """譜面を.npyに書き出し、songsテーブルに記録する行を返す"""
+        stem = hashlib.sha1(song_path.encode('utf-8')).hexdigest()
+        chart_name = stem + ".npy"
+        save_chart(os.path.join(self.charts_dir, chart_name), rhythm_data['chart'])
+        features = rhythm_data.get('features')
+        if features is not None:
+            save_features(self._features_path(stem), features)
+            # 譜面の組み立ては数ミリ秒なので、登録時に全難易度分を作っておく
+            for difficulty in DIFFICULTY_PRESETS:
+                save_chart(self._variant_path(stem, difficulty),
+                           self._compile(features, chart_settings(difficulty)))
+        return {
+            'path': song_path,
+            'title': os.path.splitext(os.path.basename(song_path))[0],
+            'chart_file': chart_name,
+            'tempo': rhythm_data.get('tempo'),
+            'duration': rhythm_data.get('duration'),
+            'added_date': added_date
         }
-        self.save_library()
+    
+    def _features_path(self, stem: str) -> str:
+        return os.path.join(self.charts_dir, f"{stem}.features.npz")
+    
+    def _variant_path(self, stem: str, difficulty: str) -> str:
+        return os.path.join(self.charts_dir, f"{stem}.{difficulty}.npy")
+    
+    def _compile(self, features: Dict, settings: Dict):
+        return compile_chart(features, settings['jump_speed'], settings['gravity'],
+                             settings['min_interval'])
+    
+    def _upsert(self, rows: list):
+        self.conn.executemany(
+            """INSERT INTO songs (path, title, chart_file, tempo, duration, added_date)
+               VALUES (:path, :title, :chart_file, :tempo, :duration, :added_date)
+               ON CONFLICT(path) DO UPDATE SET
+                   title = excluded.title, chart_file = excluded.chart_file,
+                   tempo = excluded.tempo, duration = excluded.duration,
+                   added_date = excluded.added_date""",
+            rows
+        )
     
     def load_library(self):
-        """楽曲データをJSONから読み込む"""
-        self.song_data = load_json(self.data_file)
+        """テーブルを準備し、旧形式のsong_data.jsonがあれば一度だけ移行する"""
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS songs (
+                       path TEXT PRIMARY KEY,
+                       title TEXT NOT NULL,
+                       chart_file TEXT NOT NULL,
+                       tempo REAL,
+                       duration REAL,
+                       added_date TEXT
+                   )"""
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_songs_title ON songs (title)")
+        if os.path.exists(self.legacy_data_file):
+            self._migrate_json()
     
-    def save_library(self):
-        """楽曲データをJSONに保存"""
-        save_json(self.data_file, self.song_data)
+    def _migrate_json(self):
+        """song_data.jsonの内容をSQLiteに移し、元のファイルは.migratedに改名"""
+        rows = []
+        for song_path, entry in load_json(self.legacy_data_file).items():
+            if 'rhythm_data' in entry:
+                rows.append(self._store_rhythm_data(
+                    song_path, from_legacy(entry['rhythm_data']), entry.get('added_date')
+                ))
+            else:
+                rows.append({
+                    'path': song_path,
+                    'title': os.path.splitext(os.path.basename(song_path))[0],
+                    'chart_file': entry['chart_file'],
+                    'tempo': entry.get('tempo'),
+                    'duration': entry.get('duration'),
+                    'added_date': entry.get('added_date')
+                })
+        with self._lock, self.conn:
+            self._upsert(rows)
+        os.replace(self.legacy_data_file, self.legacy_data_file + ".migrated")
     
     def get_song_list(self) -> list:
         """利用可能な楽曲のリストを返す"""
-        return list(self.song_data.keys())
+        with self._lock:
+            return [row['path'] for row in self.conn.execute("SELECT path FROM songs ORDER BY rowid")]
+    
+    def get_song_titles(self) -> list:
+        """(パス, タイトル) のリストを登録順に返す"""
+        with self._lock:
+            return [
+                (row['path'], row['title'])
+                for row in self.conn.execute("SELECT path, title FROM songs ORDER BY rowid")
+            ]
     
     def get_song_details(self, song_path: str) -> dict:
         """特定の楽曲の詳細情報を返す"""
-        return self.song_data.get(song_path, {})
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM songs WHERE path = ?", (song_path,)).fetchone()
+        return dict(row) if row else {}
+    
+    def get_rhythm_data(self, song_path: str, difficulty: Optional[str] = None,
+                        chart_params: Optional[Dict] = None) -> dict:
+        """楽曲のリズムデータを返す（譜面はこの時点でメモリマップで読み込む）
+
+        difficultyを指定すると登録時に作った難易度別の譜面を、chart_paramsで
+        物理設定などを上書きすると特徴量からその場で組み立てた譜面を返す。
+        どちらも無い曲（特徴量導入前に登録した曲など）は登録時の譜面を返す。
+        """
+        entry = self.get_song_details(song_path)
+        if not entry:
+            return {}
+        stem = os.path.splitext(entry['chart_file'])[0]
+        chart = None
+        if chart_params and os.path.exists(self._features_path(stem)):
+            features = load_features(self._features_path(stem))
+            chart = self._compile(features, chart_settings(difficulty, chart_params))
+        elif difficulty and os.path.exists(self._variant_path(stem, difficulty)):
+            chart = load_chart(self._variant_path(stem, difficulty))
+        if chart is None:
+            chart = load_chart(os.path.join(self.charts_dir, entry['chart_file']))
+        return {
+            'chart': chart,
+            'tempo': entry['tempo'],
+            'duration': entry['duration']
+        }
     
-    def get_rhythm_data(self, song_path: str) -> dict:
-        """楽曲のリズムデータを返す"""
-        return self.song_data.get(song_path, {}).get('rhythm_data', {})
+    def export_rhythm_json(self, song_path: str, filepath: str) -> None:
+        """楽曲のリズムデータをJSON形式で書き出す"""
+        export_json(filepath, self.get_rhythm_data(song_path))
     
-    def download_from_youtube(self, url: str) -> str:
-        """YouTubeから楽曲をダウンロード"""
+    def import_rhythm_json(self, song_path: str, filepath: str) -> None:
+        """JSON形式のリズムデータを読み込んで楽曲に登録"""
+        self.add_song(song_path, import_json(filepath))
+    
+    def download_from_youtube(self, url: str, progress_hook=None) -> str:
+        """YouTubeから楽曲をダウンロードし、保存したファイルのパスを返す
+
+        既定（audio_format="native"）では、ゲームで再生できるコーデックなら音声ストリームを
+        再エンコードせずに取り出し、それ以外はWAVに展開する。
+        """
+        import yt_dlp  # 読み込みに時間がかかるので使うときだけ
+        from yt_dlp.postprocessor import FFmpegExtractAudioPP
         ydl_opts = {
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-            }],
-            'outtmpl': os.path.join(self.songs_dir, '%(title)s.%(ext)s')
+            'format': DOWNLOAD_SETTINGS['format'],
+            'outtmpl': os.path.join(self.songs_dir, '%(title)s.%(ext)s'),
+            # プレイリスト内の動画URLでも1曲だけ取得する（一括取り込みは動画単位に展開してから渡す）
+            'noplaylist': True
         }
+        if progress_hook:
+            ydl_opts['progress_hooks'] = [progress_hook]
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            return os.path.join(self.songs_dir, f"{info['title']}.mp3")
+            # 選ばれた形式のコーデックを見てから後処理を決める
+            info = ydl.extract_info(url, download=False)
+            ydl.add_post_processor(
+                FFmpegExtractAudioPP(ydl, preferredcodec=self._target_codec(info)), when='post_process'
+            )
+            info = ydl.process_ie_result(info, download=True)
+            return self._downloaded_path(ydl, info)
+    
+    def _target_codec(self, info: dict) -> str:
+        """FFmpegExtractAudioに指定するコーデック（bestは入れ物の詰め替えだけでコーデックはコピー）"""
+        audio_format = DOWNLOAD_SETTINGS['audio_format']
+        if audio_format != 'native':
+            return audio_format
+        codec = (info.get('acodec') or '').split('.')[0]
+        return 'best' if codec in DOWNLOAD_SETTINGS['native_codecs'] else 'wav'
+    
+    def _downloaded_path(self, ydl, info: dict) -> str:
+        """後処理後の最終的なファイルパス（タイトルの記号はyt-dlpが置き換えるので推測しない）"""
+        for download in info.get('requested_downloads') or []:
+            if download.get('filepath'):
+                return download['filepath']
+        if info.get('filepath'):
+            return info['filepath']
+        return ydl.prepare_filename(info)
 
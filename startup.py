@@ -0,0 +1,28 @@
+"""起動時間の計測
+
+main.pyで最初に読み込み、起動の各段階の経過時間を記録する。
+"""
+import time
+from typing import List, Tuple
+
+_started = time.perf_counter()
+_marks: List[Tuple[str, float]] = []
+
+def elapsed_ms() -> float:
+    """計測開始からの経過時間（ミリ秒）"""
+    return (time.perf_counter() - _started) * 1000
+
+def mark(label: str) -> float:
+    """段階の完了を記録し、その時点の経過時間を返す"""
+    ms = elapsed_ms()
+    _marks.append((label, ms))
+    return ms
+
+def report() -> List[str]:
+    """記録した段階ごとの経過時間と前の段階からの所要時間"""
+    lines = []
+    prev = 0.0
+    for label, ms in _marks:
+        lines.append(f"{label}: {ms:.0f}ms (+{ms - prev:.0f}ms)")
+        prev = ms
+    return lines
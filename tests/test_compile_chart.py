@@ -0,0 +1,107 @@
+"""chart.compile_chartが従来のオンセットごとのループと同じ譜面を作ることの確認"""
+import librosa
+import numpy as np
+import pytest
+from chart import CHART_DTYPE, compile_chart
+from song_analyzer import SongAnalyzer
+
+SR = 22050
+
+def reference_patterns(onset_env, beats, chroma, mfcc, song_duration,
+                       jump_speed, gravity, min_interval):
+    """ベクトル化前の_generate_rhythm_patternsと_add_additional_patternsの写し
+
+    ビートが1つも無いとnp.minが空配列で例外になっていたので、その場合だけ
+    ビートのスコアを0とする。追加パターンは時刻順に差し込むようになったので、
+    最後に時刻で安定ソートする。
+    """
+    patterns = []
+    apex_time = jump_speed / gravity
+
+    onsets = librosa.onset.onset_detect(onset_envelope=onset_env, sr=SR)
+    beat_times = librosa.frames_to_time(beats, sr=SR)
+
+    target_points = int(song_duration / 2)
+    last_obstacle_time = -min_interval
+
+    for onset in librosa.frames_to_time(onsets):
+        if onset - last_obstacle_time >= min_interval:
+            frame = librosa.time_to_frames(onset, sr=SR)
+
+            chroma_score = np.max(chroma[:, frame])
+            mfcc_score = np.std(mfcc[:, frame])
+            beat_score = 1 if len(beat_times) and np.min(np.abs(beat_times - onset)) < 0.05 else 0
+
+            rhythm_strength = (chroma_score + mfcc_score + beat_score) / 3
+            jump_time = onset - apex_time
+
+            if jump_time > 0:
+                patterns.append({
+                    "jump_time": float(jump_time),
+                    "obstacle_time": float(onset),
+                    "start_time": float(jump_time - 0.2),
+                    "end_time": float(jump_time + 0.2),
+                    "rhythm_strength": float(rhythm_strength),
+                })
+                last_obstacle_time = onset
+
+    if len(patterns) < target_points:
+        additional_points = target_points - len(patterns)
+        interval = song_duration / additional_points
+        for i in range(additional_points):
+            time = (len(patterns) + i + 1) * interval
+            if time > song_duration:
+                break
+            jump_time = time - apex_time
+            if jump_time > 0:
+                patterns.append({
+                    "jump_time": float(jump_time),
+                    "obstacle_time": float(time),
+                    "start_time": float(jump_time - 0.2),
+                    "end_time": float(jump_time + 0.2),
+                    "rhythm_strength": 0.5,
+                })
+
+    return sorted(patterns, key=lambda pattern: pattern["jump_time"])
+
+def synthetic_track(seed: int, seconds: float, with_beats: bool = True):
+    """オンセット強度・ビート・クロマ・MFCCの合成データ"""
+    rng = np.random.default_rng(seed)
+    n_frames = int(seconds * SR / 512)
+    onset_env = (rng.random(n_frames) * 0.2).astype(np.float32)
+    peaks = rng.choice(n_frames, size=n_frames // 8, replace=False)
+    onset_env[peaks] += rng.random(len(peaks)).astype(np.float32) * 2
+    beats = np.arange(5, n_frames, 21) if with_beats else np.zeros(0, dtype=int)
+    chroma = rng.random((12, n_frames)).astype(np.float32)
+    mfcc = (rng.standard_normal((20, n_frames)) * 50).astype(np.float32)
+    return onset_env, beats, chroma, mfcc, n_frames * 512 / SR
+
+def compiled(onset_env, beats, chroma, mfcc, song_duration, jump_speed, gravity, min_interval):
+    # _onset_featuresは解析器の状態を使わないので、キャッシュを作らずに呼ぶ
+    analyzer = SongAnalyzer.__new__(SongAnalyzer)
+    features = analyzer._onset_features(
+        song_duration, SR, onset_env, beats, 120.0,
+        np.max(chroma, axis=0),
+        np.std(np.ascontiguousarray(mfcc.T), axis=1)
+    )
+    return compile_chart(features, jump_speed, gravity, min_interval)
+
+@pytest.mark.parametrize("jump_speed, gravity, min_interval", [
+    (15, 0.8, 0.8),    # 既定値（頂点まで18.75秒なので前半のオンセットは採用されない）
+    (15, 0.8, 0.5),
+    (15, 0.8, 1.2),
+    (0.5, 1.0, 0.3),
+    (1, 2, 0.0),       # 最小間隔なし
+    (3, 1, 1.5),
+    (60, 1.0, 0.8),    # 頂点が曲の後ろで、すべてのオンセットのjump_timeが0以下
+])
+@pytest.mark.parametrize("seed, with_beats", [(0, True), (1, True), (2, False)])
+def test_compile_chart_matches_reference(jump_speed, gravity, min_interval, seed, with_beats):
+    track = synthetic_track(seed, 45.0, with_beats)
+    expected = reference_patterns(*track, jump_speed, gravity, min_interval)
+    chart = compiled(*track, jump_speed, gravity, min_interval)
+
+    assert chart.dtype == CHART_DTYPE
+    assert len(chart) == len(expected)
+    for name in CHART_DTYPE.names:
+        np.testing.assert_array_equal(chart[name], [pattern[name] for pattern in expected], err_msg=name)
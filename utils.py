@@ -1,6 +1,8 @@
+import hashlib
 import json
 import os
-from typing import Dict, Any
+import tempfile
+from typing import BinaryIO, Callable, Dict, Any, List, Tuple
 
 def load_json(filepath: str) -> Dict:
     """JSONファイルを読み込む"""
@@ -16,6 +18,20 @@ def save_json(filepath: str, data: Dict) -> None:
     with open(filepath, 'w') as f:
         json.dump(data, f, indent=2)
 
+def atomic_write(filepath: str, write: Callable[[BinaryIO], None]) -> None:
+    """write(f)で一時ファイルに書いてから置き換え、書きかけのファイルを見せない"""
+    directory = os.path.dirname(filepath) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, filepath)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 def format_time(seconds: float) -> str:
     """秒数を「分:秒」形式にフォーマット"""
     minutes = int(seconds // 60)
@@ -26,3 +42,28 @@ def ensure_dir_exists(directory: str) -> None:
     """ディレクトリが存在しない場合は作成"""
     if not os.path.exists(directory):
         os.makedirs(directory)
+
+_digest_memo: Dict[Tuple[str, int, int], str] = {}
+
+def file_digest(filepath: str, chunk_size: int = 1 << 20) -> str:
+    """ファイル内容のSHA-256ダイジェストを返す（サイズ・更新時刻が同じなら再計算しない）"""
+    stat = os.stat(filepath)
+    memo_key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    digest = _digest_memo.get(memo_key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        _digest_memo[memo_key] = digest
+    return digest
+
+def find_audio_files(directory: str, extensions: Tuple[str, ...]) -> List[str]:
+    """ディレクトリ以下の音声ファイルを再帰的に探してパス順に返す"""
+    audio_files = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(extensions):
+                audio_files.append(os.path.join(root, name))
+    return sorted(audio_files)